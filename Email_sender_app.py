@@ -7,14 +7,911 @@ https://support.google.com/accounts/answer/185833?hl=pl
 
 import os
 import re
+import sys
+import csv
+import json
+import time
+import queue
+import base64
+import hashlib
+import tempfile
+import asyncio
+import getpass
+import socket
+import sqlite3
 import smtplib
+import argparse
+import threading
 import mimetypes
+from string import Template
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import *  # type: ignore
-from email import encoders # type: ignore
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from tkinter import messagebox, filedialog
-from email.mime.multipart import MIMEMultipart
+from tkinter import messagebox, filedialog, ttk
+from email import policy
+from email.utils import formatdate, make_msgid
+
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587
+OUTBOX_PATH = os.path.join(os.path.expanduser('~'), '.email_sender_outbox.sqlite3')
+SENDING_LEASE = 900
+OUTBOX_BUSY_TIMEOUT = 30
+ATTACHMENT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'email_sender_attachments')
+
+
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[a-zA-Z0-9]+')
+_ADDRESS_SEPARATORS = re.compile(r'[,;]')
+
+
+class DomainResolver:
+    """
+    Checks whether the domain of an address can receive mail, remembering every answer.
+
+    The standard library has no MX lookup, so by default a domain counts as deliverable when it
+    resolves to an address (the implicit MX of RFC 5321). Pass another `lookup(domain) -> bool`,
+    e.g. a local stub in tests or a real MX query, to change that.
+    """
+
+    def __init__(self, lookup=None):
+        """Creates a resolver with an empty cache."""
+        self._lookup = lookup or self._resolves
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resolves(domain):
+        """Tells whether the domain has an A or AAAA record."""
+        try:
+            socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+            return True
+        except (socket.gaierror, UnicodeError):
+            return False
+
+    def accepts(self, domain):
+        """Tells whether mail can be delivered to the domain, asking the lookup only once per domain."""
+        domain = domain.lower()
+        with self._lock:
+            if domain in self._cache:
+                return self._cache[domain]
+        result = self._lookup(domain)
+        with self._lock:
+            self._cache[domain] = result
+        return result
+
+
+def split_addresses(text):
+    """Splits a comma or semicolon separated list of addresses, dropping empty entries."""
+    return [address for address in map(str.strip, _ADDRESS_SEPARATORS.split(text)) if address]
+
+
+def validate_recipients(recipients, resolver=None):
+    """
+    Splits, deduplicates and validates recipient addresses.
+
+    `recipients` is a string with comma or semicolon separated addresses, or an iterable of such
+    strings of any size. Duplicates are compared case-insensitively and only the first one is kept.
+    With a `DomainResolver`, addresses whose domain cannot receive mail are rejected too.
+    Returns the lists of valid and invalid addresses, both in input order.
+    """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    fullmatch = EMAIL_PATTERN.fullmatch
+    valid, invalid, seen = [], [], set()
+    for item in recipients:
+        addresses = split_addresses(item) if ',' in item or ';' in item else [item.strip()]
+        for address in addresses:
+            key = address.lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if fullmatch(address) and (resolver is None or resolver.accepts(address.rpartition('@')[2])):
+                valid.append(address)
+            else:
+                invalid.append(address)
+    return valid, invalid
+
+
+class AttachmentError(Exception):
+    """Raised when a file cannot be attached to a message."""
+
+
+class SendCancelled(Exception):
+    """Raised when a message is cancelled before it has been handed over to the server."""
+
+
+def _private_directory(path):
+    """Creates a directory that only the current user can access, refusing one that belongs to someone else."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        stat = os.stat(path)
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f"'{path}' belongs to another user.")
+        if stat.st_mode & 0o077:
+            os.chmod(path, 0o700)
+
+
+class AttachmentCache:
+    """
+    Size-bounded LRU cache of base64-encoded attachment bodies stored on disk.
+
+    Encoded bodies are keyed by the SHA-256 of the file content, so the same brochure sent to
+    thousands of recipients is read, hashed and encoded only once. The hash and MIME type of a
+    path are remembered together with its size and mtime, so unchanged files are not re-hashed.
+
+    The directory must belong to the current user and is kept private. Entries left by earlier
+    runs are checked against their digest the first time they are used and encoded again if they
+    do not match, so a tampered or truncated entry is never sent.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        """Opens (or creates) the cache directory and indexes the entries already stored in it."""
+        self.hits = 0
+        self.misses = 0
+        self.max_bytes = max_bytes
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._paths = {}
+        self._entries = OrderedDict()
+        self._verified = set()
+        _private_directory(directory)
+        stored = (entry for entry in os.scandir(directory) if entry.name.endswith('.b64') and entry.is_file(follow_symlinks=False))
+        for entry in sorted(stored, key=lambda entry: entry.stat().st_mtime):
+            self._entries[entry.name[:-4]] = entry.stat().st_size
+        self.total_bytes = sum(self._entries.values())
+        self._evict()
+
+    def open(self, path):
+        """Returns the MIME type of `path` and a handle to its encoded body, opened under the lock so a concurrent eviction cannot remove it first."""
+        stat = os.stat(path)
+        key = os.path.realpath(path)
+        with self._lock:
+            known = self._paths.get(key)
+            if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+                mime_type, _ = mimetypes.guess_type(path)
+                known = (stat.st_size, stat.st_mtime_ns, self._file_digest(path), mime_type or 'application/octet-stream')
+                self._paths[key] = known
+            digest, mime_type = known[2:]
+
+            if digest in self._entries and (digest in self._verified or self._is_intact(digest)):
+                self.hits += 1
+                self._entries.move_to_end(digest)
+            else:
+                self.misses += 1
+                self.total_bytes -= self._entries.pop(digest, 0)
+                self._entries[digest] = self._encode(path, digest)
+                self.total_bytes += self._entries[digest]
+                self._evict()
+            self._verified.add(digest)
+            return mime_type, open(self._entry_path(digest), 'rb')
+
+    def _entry_path(self, digest):
+        """Returns where the encoded body with the given digest is stored."""
+        return os.path.join(self._directory, f'{digest}.b64')
+
+    @staticmethod
+    def _file_digest(path):
+        """Hashes a file in chunks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _is_intact(self, digest):
+        """Tells whether a stored entry is the exact encoding of content with the given digest."""
+        content = hashlib.sha256()
+        try:
+            with open(self._entry_path(digest), 'rb') as encoded:
+                while chunk := encoded.read(78 * 1024):
+                    decoded = base64.b64decode(chunk)
+                    if base64.encodebytes(decoded).replace(b'\n', b'\r\n') != chunk:
+                        return False
+                    content.update(decoded)
+        except (OSError, ValueError):
+            return False
+        return content.hexdigest() == digest
+
+    def _encode(self, path, digest):
+        """Writes the encoded body of `path` into the cache and returns its size."""
+        # mkstemp gives every writer its own file (created 0600), so processes encoding the same attachment do not collide.
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=self._directory)
+        try:
+            with open(path, 'rb') as source, open(descriptor, 'wb') as target:
+                while chunk := source.read(StreamingMessage.CHUNK_SIZE):
+                    target.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+            os.replace(temporary_path, self._entry_path(digest))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return os.path.getsize(self._entry_path(digest))
+
+    def _evict(self):
+        """Drops the least recently used entries until the cache fits in `max_bytes`, keeping the newest one."""
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            digest, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self._verified.discard(digest)
+            try:
+                os.remove(self._entry_path(digest))
+            except OSError:
+                pass  # Still open by a message being sent (Windows); it is overwritten on the next miss.
+
+    def stats(self):
+        """Returns hit/miss counters and the current cache size."""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self.total_bytes}
+
+
+class StreamingMessage:
+    """
+    Plain-text email with any number of file attachments that is serialized in chunks.
+
+    Attachments are read and base64-encoded `CHUNK_SIZE` bytes at a time while the message is
+    written, so neither the raw file nor its encoded copy is ever held in memory as a whole.
+    The message can be written to a spool file with `write_to` or straight into an SMTP DATA
+    command with `send`.
+    """
+
+    CHUNK_SIZE = 57 * 1024  # A multiple of 57 bytes, so every chunk encodes to complete 76-character lines.
+
+    def __init__(self, sender, recipients, subject, body, attachment_paths=(), cache=None):
+        """Stores the message fields; attachments are opened only when the message is written."""
+        self.sender = sender
+        self.recipients = split_addresses(recipients) if isinstance(recipients, str) else list(recipients)
+        self.subject = subject
+        self.body = body
+        self.attachment_paths = list(attachment_paths)
+        self._cache = cache
+        self._boundary = make_msgid().strip('<>').replace('@', '.')
+        # Fixed per message, so a retried or resent message keeps its identity.
+        self.message_id = make_msgid()
+        self._date = formatdate(localtime=True)
+
+    @staticmethod
+    def _header_block(headers):
+        """Serializes (name, value) pairs into a CRLF-terminated header block, encoding non-ASCII values."""
+        folded = (policy.SMTP.fold_binary(name, policy.SMTP.header_factory(name, value)) for name, value in headers)
+        return b''.join(folded) + b'\r\n'
+
+    def _headers(self):
+        """Returns the top-level message headers."""
+        return self._header_block([('From', self.sender), ('To', ', '.join(self.recipients)), ('Subject', self.subject), ('Date', self._date),
+                                   ('Message-ID', self.message_id), ('MIME-Version', '1.0'), ('Content-Type', f'multipart/mixed; boundary="{self._boundary}"')])
+
+    def iter_chunks(self):
+        """Yields the serialized message in chunks that always end on a line boundary."""
+        boundary = f'--{self._boundary}\r\n'.encode('ascii')
+        yield self._headers()
+        yield boundary + MIMEText(self.body, 'plain').as_bytes(policy=policy.SMTP) + b'\r\n'
+        for path in self.attachment_paths:
+            if self._cache is None:
+                mime_type, _ = mimetypes.guess_type(path)
+                yield boundary + self._attachment_headers(path, mime_type or 'application/octet-stream')
+                with open(path, 'rb') as attachment:
+                    while chunk := attachment.read(self.CHUNK_SIZE):
+                        yield base64.encodebytes(chunk).replace(b'\n', b'\r\n')
+            else:
+                mime_type, encoded = self._cache.open(path)
+                with encoded:
+                    yield boundary + self._attachment_headers(path, mime_type)
+                    # Every encoded line but the last is 78 bytes long, so these reads stay line-aligned.
+                    while chunk := encoded.read(78 * 1024):
+                        yield chunk
+        yield f'--{self._boundary}--\r\n'.encode('ascii')
+
+    @staticmethod
+    def _attachment_headers(path, mime_type):
+        """Returns the MIME headers of one attachment part."""
+        filename = os.path.basename(path)
+        return StreamingMessage._header_block([('Content-Type', mime_type), ('Content-Transfer-Encoding', 'base64'), ('Content-Disposition', f'attachment; filename="{filename}"')])
+
+    def write_to(self, file):
+        """Writes the whole message to a binary file object, e.g. a spool file."""
+        for chunk in self.iter_chunks():
+            file.write(chunk)
+
+    def send(self, server):
+        """Transmits the message over a connected `smtplib.SMTP` without building it in memory first."""
+        if not self.recipients:
+            raise ValueError('The message has no recipients.')
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(self.sender)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.sender)
+        refused = {}
+        for recipient in self.recipients:
+            code, response = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(self.recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        server.putcmd('data')
+        code, response = server.getreply()
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+        buffer = bytearray()
+        try:
+            for chunk in self.iter_chunks():
+                # Small parts are coalesced so a short message goes out in one write instead of several tiny packets.
+                buffer += _DOT_AT_LINE_START.sub(b'..', chunk)
+                if len(buffer) >= self.CHUNK_SIZE:
+                    server.send(bytes(buffer))
+                    buffer.clear()
+        except (OSError, ValueError):
+            # The server is waiting for the rest of the DATA, so the connection cannot be reused.
+            server.close()
+            raise
+        server.send(bytes(buffer + b'.\r\n'))
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+
+_DOT_AT_LINE_START = re.compile(rb'^\.', re.MULTILINE)
+
+
+def build_message(sender, recipient, subject, body, attachment_paths=(), cache=None):
+    """Builds a streaming message, checking up front that every attachment can be read."""
+    for path in attachment_paths:
+        if not os.path.isfile(path) or not os.access(path, os.R_OK):
+            raise AttachmentError(f"Cannot read '{path}'.")
+    return StreamingMessage(sender, recipient, subject, body, attachment_paths, cache)
+
+
+class SMTPSession:
+    """
+    A single authenticated SMTP session that is kept alive between messages.
+
+    The session authenticates once, probes the socket with NOOP before sending when it has been
+    idle for a while, and transparently reconnects when the server has dropped the connection.
+    Handshake and reconnect counts and timings are kept so the savings can be inspected with `stats`.
+    """
+
+    def __init__(self, username, password, host=SMTP_HOST, port=SMTP_PORT, use_tls=True, timeout=30, probe_after=5):
+        """Stores the connection settings; `connect` opens the session."""
+        self.sent = 0
+        self.handshakes = 0
+        self.reconnects = 0
+        self.noops = 0
+        self.handshake_seconds = 0.0
+        self.last_handshake_seconds = 0.0
+        self.last_send_seconds = 0.0
+        self._username = username
+        self._password = password
+        self._host = host
+        self._port = port
+        self._use_tls = use_tls
+        self._timeout = timeout
+        self._probe_after = probe_after
+        self._server = None
+        self._closed = False
+        self._last_used = 0.0
+        self._lock = threading.RLock()
+
+    def connect(self):
+        """Opens the connection, upgrades it with STARTTLS and authenticates."""
+        with self._lock:
+            start = time.perf_counter()
+            server = smtplib.SMTP(self._host, self._port, timeout=self._timeout)
+            try:
+                if self._use_tls:
+                    server.starttls()
+                if self._username and self._password:
+                    server.login(self._username, self._password)
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+            self._last_used = time.monotonic()
+            self.handshakes += 1
+            self.last_handshake_seconds = time.perf_counter() - start
+            self.handshake_seconds += self.last_handshake_seconds
+
+    def _reconnect(self):
+        """Drops the current socket and opens a fresh session."""
+        self._drop()
+        self.reconnects += 1
+        self.connect()
+
+    def _drop(self):
+        """Closes the socket without waiting for the server."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def is_alive(self):
+        """Checks the connection with a NOOP round trip."""
+        with self._lock:
+            if self._server is None:
+                return False
+            try:
+                self.noops += 1
+                alive = self._server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+            if alive:
+                self._last_used = time.monotonic()
+            return alive
+
+    def heartbeat(self):
+        """Keeps an idle session alive, reconnecting if the server has closed it."""
+        with self._lock:
+            if self._server is not None and not self.is_alive():
+                self._reconnect()
+
+    def send_message(self, msg):
+        """Sends a `StreamingMessage`, reconnecting first if the session went stale and once more if the send hits a dead socket."""
+        with self._lock:
+            if self._closed:
+                raise smtplib.SMTPServerDisconnected('The session has been closed.')
+            if self._server is None:
+                self._reconnect()
+            elif time.monotonic() - self._last_used >= self._probe_after and not self.is_alive():
+                self._reconnect()
+
+            start = time.perf_counter()
+            try:
+                msg.send(self._server)
+            except smtplib.SMTPServerDisconnected:
+                self._reconnect()
+                msg.send(self._server)
+            self.last_send_seconds = time.perf_counter() - start
+            self._last_used = time.monotonic()
+            self.sent += 1
+
+    def close(self):
+        """Ends the session politely, ignoring errors from an already dead socket. A closed session never reconnects."""
+        with self._lock:
+            self._closed = True
+            if self._server is None:
+                return
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+    def stats(self):
+        """Returns handshake, reconnect and latency figures for this session."""
+        return {
+            'handshakes': self.handshakes,
+            'reconnects': self.reconnects,
+            'noops': self.noops,
+            'sent': self.sent,
+            'avg_handshake_ms': round(self.handshake_seconds / self.handshakes * 1000, 1) if self.handshakes else 0.0,
+            'last_handshake_ms': round(self.last_handshake_seconds * 1000, 1),
+            'last_send_ms': round(self.last_send_seconds * 1000, 1),
+        }
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated SMTP connections.
+
+    Every connection is an `SMTPSession`. A session is closed and replaced once it has sent
+    `max_messages` messages, and a session that fails while sending is discarded, so the next
+    caller transparently gets a fresh one.
+    """
+
+    def __init__(self, username, password, host=SMTP_HOST, port=SMTP_PORT, size=4, max_messages=100, use_tls=True, timeout=30):
+        """Stores the connection settings; connections are opened lazily."""
+        self.size = size
+        self.connections_opened = 0
+        self._username = username
+        self._password = password
+        self._host = host
+        self._port = port
+        self._max_messages = max_messages
+        self._use_tls = use_tls
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Opens and authenticates a new SMTP session."""
+        session = SMTPSession(self._username, self._password, host=self._host, port=self._port, use_tls=self._use_tls, timeout=self._timeout)
+        session.connect()
+        with self._lock:
+            self.connections_opened += 1
+        return session
+
+    def _acquire(self):
+        """Takes an idle connection or opens a new one, waiting while all slots are busy."""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, session, broken=False):
+        """Returns a session to the pool, closing it if it is broken or exhausted."""
+        try:
+            if broken or session.sent >= self._max_messages:
+                session.close()
+            else:
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+
+    def send(self, msg):
+        """Sends a single message over a pooled session."""
+        session = self._acquire()
+        try:
+            session.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._release(session, broken=True)
+            raise
+        except smtplib.SMTPException:
+            self._release(session)
+            raise
+        except OSError:
+            self._release(session, broken=True)
+            raise
+        except Exception:
+            self._release(session)
+            raise
+        self._release(session)
+
+    def close(self):
+        """Closes every idle session."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def is_transient_error(error):
+    """Tells whether a send failure is worth retrying: 4xx replies and dropped connections are, 5xx replies are not."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # An empty refusal (no recipients at all) is not something a retry can fix.
+        return bool(error.recipients) and all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # Every SMTPException is an OSError, so the remaining SMTP errors are excluded explicitly.
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class Outbox:
+    """
+    Durable queue of outgoing messages stored in SQLite.
+
+    A message stays in the outbox until it has been sent or has permanently failed, so nothing is
+    lost when sending fails or the program stops. Several processes (the app and `outbox run`) can
+    share one outbox: a message is claimed atomically and leased for `lease` seconds, and a message
+    whose lease ran out, because the process sending it died, is handed out again.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, lease=SENDING_LEASE):
+        """Opens (or creates) the outbox database."""
+        self._lease = lease
+        self._lock = threading.Lock()
+        # Waits this long for another process that holds the write lock before failing with "database is locked".
+        self._connection = sqlite3.connect(path, timeout=OUTBOX_BUSY_TIMEOUT, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                'id INTEGER PRIMARY KEY, sender TEXT, recipient TEXT, subject TEXT, body TEXT, attachments TEXT, '
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, last_error TEXT, "
+                'claimed_at REAL)')
+            columns = [row[1] for row in self._connection.execute('PRAGMA table_info(messages)')]
+            if 'claimed_at' not in columns:
+                self._connection.execute('ALTER TABLE messages ADD COLUMN claimed_at REAL')
+
+    def enqueue(self, sender, recipient, subject, body, attachment_paths=()):
+        """Stores a message for sending and returns its id."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO messages (sender, recipient, subject, body, attachments, next_attempt) VALUES (?, ?, ?, ?, ?, ?)',
+                (sender, recipient, subject, body, json.dumps(list(attachment_paths)), time.time()))
+        return cursor.lastrowid
+
+    def _claimable(self, now, sender):
+        """Returns the condition and parameters matching pending messages and messages whose sending lease ran out."""
+        condition = "(status = 'pending' OR (status = 'sending' AND COALESCE(claimed_at, 0) <= ?))"
+        parameters = [now - self._lease]
+        if sender is not None:
+            condition += ' AND sender = ?'
+            parameters.append(sender)
+        return condition, parameters
+
+    def claim_next(self, sender=None):
+        """Marks the oldest due message as being sent and returns it, or returns None if nothing is due."""
+        now = time.time()
+        condition, parameters = self._claimable(now, sender)
+        with self._lock, self._connection:
+            # The write lock is taken before reading, so two processes cannot claim the same message.
+            self._connection.execute('BEGIN IMMEDIATE')
+            row = self._connection.execute(
+                f'SELECT id, sender, recipient, subject, body, attachments, attempts FROM messages WHERE {condition} AND next_attempt <= ? '
+                'ORDER BY next_attempt, id LIMIT 1', parameters + [now]).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE messages SET status = 'sending', claimed_at = ? WHERE id = ?", (now, row[0]))
+        message_id, sender, recipient, subject, body, attachments, attempts = row
+        return {'id': message_id, 'sender': sender, 'recipient': recipient, 'subject': subject, 'body': body, 'attachments': json.loads(attachments), 'attempts': attempts}
+
+    def _update(self, message_id, status, error=None, delay=0):
+        """Records the outcome of one delivery attempt."""
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE messages SET status = ?, attempts = attempts + 1, last_error = ?, next_attempt = ? WHERE id = ?',
+                                     (status, error, time.time() + delay, message_id))
+
+    def mark_sent(self, message_id):
+        """Marks a message as delivered."""
+        self._update(message_id, 'sent')
+
+    def mark_retry(self, message_id, error, delay):
+        """Puts a message back in the queue to be retried after `delay` seconds."""
+        self._update(message_id, 'pending', error, delay)
+
+    def mark_failed(self, message_id, error):
+        """Gives up on a message."""
+        self._update(message_id, 'failed', error)
+
+    def next_due(self, sender=None):
+        """Returns when the next pending message becomes due, or None if there is none."""
+        condition, parameters = self._claimable(time.time(), sender)
+        with self._lock:
+            return self._connection.execute(f'SELECT MIN(next_attempt) FROM messages WHERE {condition}', parameters).fetchone()[0]
+
+    def counts(self):
+        """Returns the number of messages in each status."""
+        with self._lock:
+            return dict(self._connection.execute('SELECT status, COUNT(*) FROM messages GROUP BY status').fetchall())
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+
+class RateLimiter:
+    """Allows at most `per_minute` events in any 60-second window."""
+
+    def __init__(self, per_minute):
+        """Creates a limiter; a non-positive rate disables limiting."""
+        self._per_minute = per_minute
+        self._events = deque()
+
+    def delay(self):
+        """Returns how many seconds to wait before the next event is allowed."""
+        if self._per_minute <= 0:
+            return 0.0
+        now = time.monotonic()
+        while self._events and now - self._events[0] >= 60:
+            self._events.popleft()
+        if len(self._events) < self._per_minute:
+            return 0.0
+        return 60 - (now - self._events[0])
+
+    def record(self):
+        """Records that an event happened now."""
+        self._events.append(time.monotonic())
+
+
+class OutboxWorker:
+    """
+    Drains an `Outbox` through an `SMTPSession`.
+
+    Transient failures are retried with exponential backoff (`base_delay` doubled after each
+    attempt, capped at `max_delay`) and sends are throttled to `per_minute` messages so the
+    provider's rate limits are not hit.
+    """
+
+    def __init__(self, outbox, session, per_minute=20, max_attempts=6, base_delay=30, max_delay=3600, sender=None, cache=None):
+        """Configures the worker; `sender` restricts it to messages from one account."""
+        self._outbox = outbox
+        self._session = session
+        self._limiter = RateLimiter(per_minute)
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._sender = sender
+        self._cache = cache
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def run_once(self):
+        """Sends the next due message if the rate limit allows it. Returns True if a message was processed."""
+        if self._limiter.delay() > 0:
+            return False
+        try:
+            message = self._outbox.claim_next(self._sender)
+        except sqlite3.OperationalError:
+            return False  # Another process kept the outbox locked; the claim is retried on the next tick.
+        if message is None:
+            return False
+
+        self._limiter.record()
+        try:
+            msg = build_message(message['sender'], message['recipient'], message['subject'], message['body'], message['attachments'], self._cache)
+            self._session.send_message(msg)
+        except Exception as e:
+            attempts = message['attempts'] + 1
+            if is_transient_error(e) and attempts < self._max_attempts:
+                self._outbox.mark_retry(message['id'], str(e), min(self._base_delay * 2 ** (attempts - 1), self._max_delay))
+                self.retried += 1
+            else:
+                self._outbox.mark_failed(message['id'], str(e))
+                self.failed += 1
+        else:
+            self._outbox.mark_sent(message['id'])
+            self.sent += 1
+        return True
+
+    def run(self, stop=None, drain=False):
+        """Keeps sending until `stop` is set, or until nothing is pending when `drain` is True."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once():
+                continue
+            next_due = self._outbox.next_due(self._sender)
+            if next_due is None and drain:
+                return
+            wait = max(self._limiter.delay(), (next_due or time.time() + 1) - time.time())
+            stop.wait(min(max(wait, 0.05), 1.0))
+
+
+def load_recipients(path):
+    """Yields mail-merge rows from a CSV file with a header or from a JSONL file. Each row needs an 'email' field."""
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+class MailMerge:
+    """
+    Headless bulk sender that renders a subject and body template for every recipient row
+    and sends the messages concurrently through an `SMTPConnectionPool`.
+
+    Templates use `string.Template` placeholders, e.g. 'Hello $name', filled from the row's fields.
+    """
+
+    def __init__(self, pool, sender, subject_template, body_template, attachment_paths=(), retries=2, cache=None):
+        """Prepares the templates and counters for a campaign."""
+        self._pool = pool
+        self._sender = sender
+        self._subject = Template(subject_template)
+        self._body = Template(body_template)
+        self._attachment_paths = list(attachment_paths)
+        self._retries = retries
+        self._cache = cache
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.errors = []
+
+    def _send_row(self, row):
+        """Renders and sends the message for one row, reconnecting and retrying on transient failures."""
+        recipient = row.get('email', '')
+        try:
+            msg = build_message(self._sender, recipient, self._subject.substitute(row), self._body.substitute(row), self._attachment_paths, self._cache)
+        except Exception as e:
+            self._record_failure(recipient, e)
+            return
+
+        for attempt in range(self._retries + 1):
+            try:
+                self._pool.send(msg)
+                with self._lock:
+                    self.sent += 1
+                return
+            except Exception as e:
+                error = e
+                if not is_transient_error(e):
+                    break
+            if attempt < self._retries:
+                with self._lock:
+                    self.retried += 1
+        self._record_failure(recipient, error)
+
+    def _record_failure(self, recipient, error):
+        """Counts a failed recipient and remembers why it failed."""
+        with self._lock:
+            self.failed += 1
+            self.errors.append((recipient, str(error)))
+
+    def run(self, rows):
+        """Sends a message for every row and returns a throughput report."""
+        start = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self._pool.size * 4)
+
+        def task(row):
+            try:
+                self._send_row(row)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self._pool.size) as executor:
+            for row in rows:
+                in_flight.acquire()
+                executor.submit(task, row)
+        self._pool.close()
+
+        elapsed = time.perf_counter() - start
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retried,
+            'connections': self._pool.connections_opened,
+            'seconds': round(elapsed, 3),
+            'messages_per_sec': round(self.sent / elapsed, 2) if elapsed else 0.0,
+            'cache': self._cache.stats() if self._cache else None,
+            'errors': self.errors,
+        }
+
+
+class BackgroundLoop:
+    """
+    Runs an asyncio event loop in a daemon thread so that blocking SMTP work never runs on the Tk thread.
+
+    Jobs are started with `submit`, run concurrently in the loop's thread pool, and their results are
+    handed back to the Tk thread through a queue that is polled with `after()`.
+    """
+
+    def __init__(self, widget, poll_interval=50):
+        """Starts the event loop thread and the Tk-side result polling."""
+        self._widget = widget
+        self._poll_interval = poll_interval
+        self._results = queue.Queue()
+        self._pending = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._widget.after(self._poll_interval, self._poll)
+
+    @property
+    def pending(self):
+        """Number of jobs that have not finished yet."""
+        return len(self._pending)
+
+    def submit(self, func, *args, callback=None, track=True):
+        """Runs `func(*args)` in the background; `callback(result, error)` is later called on the Tk thread. Untracked jobs are left out of `pending`."""
+        future = asyncio.run_coroutine_threadsafe(asyncio.to_thread(func, *args), self._loop)
+        if track:
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._results.put((done, callback)))
+        return future
+
+    def _poll(self):
+        """Delivers finished job results to their callbacks on the Tk thread."""
+        while True:
+            try:
+                future, callback = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(future)
+            if callback is None:
+                continue
+            if future.cancelled():
+                callback(None, asyncio.CancelledError())
+            elif future.exception() is not None:
+                callback(None, future.exception())
+            else:
+                callback(future.result(), None)
+        self._widget.after(self._poll_interval, self._poll)
+
 
 class EmailApp(Frame):
     """
@@ -22,6 +919,8 @@ class EmailApp(Frame):
     """
 
     _trials = 0
+    HEARTBEAT_INTERVAL = 60000
+    OUTBOX_INTERVAL = 5000
 
     def __init__(self, master):
         """Initializes the application, sets up the main window, and creates widgets."""
@@ -29,7 +928,17 @@ class EmailApp(Frame):
         self._server = None
         self._username = None
         self._password = None
-        self._attachment_path = None
+        self._attachment_paths = []
+        self._send_lock = threading.Lock()
+        self._attachment_cache = AttachmentCache(ATTACHMENT_CACHE_DIR)
+        self._outbox = Outbox()
+        self._outbox_worker = None
+        self._outbox_stop = threading.Event()
+        self._outbox_drain = None
+        self._send_cancels = set()
+        self._heartbeat_job = None
+        self._outbox_job = None
+        self._background = BackgroundLoop(self)
         self._create_widgets()
         self.grid(sticky='nsew')
         self._show_login()
@@ -41,6 +950,7 @@ class EmailApp(Frame):
         self.master.config(menu=self._main_menu)  # type: ignore
         self._main_menu.add_cascade(label='About program', menu=self._sub_menu)
         self._sub_menu.add_command(label='Help', command=self._help_me)
+        self._sub_menu.add_command(label='Connection info', command=self._show_connection_info)
         self._sub_menu.add_command(label='Exit', command=self.master.destroy)
 
         self._login_widgets = Frame(self, bg='#f0f0f0', padx=20, pady=20)
@@ -68,6 +978,9 @@ class EmailApp(Frame):
         self._login_button = Button(self._login_widgets, text='Login', font=('Arial', 14, 'bold'), bg='#007bff', fg='white', command=self._login)
         self._login_button.grid(row=4, column=0, columnspan=2, pady=10)
 
+        self._login_status_label = Label(self._login_widgets, text='', bg='#f0f0f0')
+        self._login_status_label.grid(row=5, column=0, columnspan=2)
+
         self._email_widgets = Frame(self, bg='#f0f0f0', padx=20, pady=20)
         self._email_widgets.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
         self._email_widgets.grid_forget()
@@ -99,7 +1012,7 @@ class EmailApp(Frame):
         self._entry_for_email_message = Text(self._text_frame, wrap='word', height=10)
         self._entry_for_email_message.pack(side=LEFT, fill=BOTH, expand=True)
 
-        self._attach_file_button = Button(self._email_widgets, text='Attach File', command=self._attach_file)
+        self._attach_file_button = Button(self._email_widgets, text='Attach Files', command=self._attach_file)
         self._attach_file_button.grid(row=4, column=0, pady=5, padx=(0, 10))
 
         self._file_label = Label(self._email_widgets, text='No file selected', bg='#f0f0f0')
@@ -114,6 +1027,9 @@ class EmailApp(Frame):
         self._message_label = Label(self._email_widgets, font=('Arial', 14), bg='#f0f0f0')
         self._message_label.grid(row=6, column=0, columnspan=3, pady=5)
 
+        self._progress_bar = ttk.Progressbar(self._email_widgets, mode='indeterminate')
+        self._cancel_button = Button(self._email_widgets, text='Cancel', command=self._cancel_sending)
+
         self._email_widgets.grid_columnconfigure(0, weight=1)
         self._email_widgets.grid_columnconfigure(1, weight=0)
         self._email_widgets.grid_columnconfigure(2, weight=1)
@@ -128,11 +1044,11 @@ class EmailApp(Frame):
             self._entry_for_password.config(show='*')
 
     def _attach_file(self):
-        """Opens a file dialog to select a file and updates the file path."""
-        file_path = filedialog.askopenfilename()
-        if file_path:
-            self._attachment_path = file_path
-            self._file_label.config(text=file_path.split('/')[-1])
+        """Opens a file dialog to select one or more files and updates the attachment list."""
+        file_paths = filedialog.askopenfilenames()
+        if file_paths:
+            self._attachment_paths = list(file_paths)
+            self._file_label.config(text=', '.join(os.path.basename(path) for path in file_paths))
 
     def _show_login(self):
         """Shows the login widgets and hides the email sending widgets."""
@@ -152,7 +1068,7 @@ class EmailApp(Frame):
             messagebox.showinfo('Help!', "Click 'Send email!' to send the email.")
 
     def _login_verification(self):
-        """Verifies the login credentials."""
+        """Verifies that the login fields are filled in and the email is well-formed."""
         email = self._entry_for_email.get()
         password = self._entry_for_password.get()
 
@@ -160,43 +1076,102 @@ class EmailApp(Frame):
             messagebox.showerror('Login error!', "You can't leave any field blank!")
             return False
 
-        if not re.match(r'[^@\s]+@[^@\s]+\.[a-zA-Z0-9]+$', email):
+        if not EMAIL_PATTERN.fullmatch(email):
             messagebox.showerror('Login error!', 'Enter a valid email!')
             return False
 
-        try:
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(email, password)
-            server.quit()
-            return True
-        except Exception:
-            messagebox.showerror('Login error!', 'Enter a valid password!')
-            return False
+        return True
+
+    @staticmethod
+    def _authenticate(username, password):
+        """Opens the one SMTP session used for both credential checking and sending. Runs in the background."""
+        session = SMTPSession(username, password)
+        session.connect()
+        return session
 
     def _login(self):
-        """Handles user login and switches to email sending interface if successful."""
+        """Starts logging in without blocking the window; `_on_login` handles the outcome."""
         EmailApp._trials += 1
         if self._login_verification():
-            self._username = self._entry_for_email.get()
-            self._password = self._entry_for_password.get()
-            try:
-                self._server = smtplib.SMTP('smtp.gmail.com', 587)
-                self._server.starttls()
-                self._server.login(self._username, self._password)
-                self._show_email()
-                self.master.update_idletasks()
-                self.master.geometry(f'{self._email_widgets.winfo_reqwidth()}x{self._email_widgets.winfo_reqheight()}')  # type: ignore
-                self.master.resizable(False, False)  # type: ignore
-            except Exception as e:
-                messagebox.showerror('Login error!', f'Failed to log in: {str(e)}')
+            username = self._entry_for_email.get()
+            password = self._entry_for_password.get()
+            self._login_button.config(state=DISABLED)
+            self._login_status_label.config(text='Logging in...', fg='black')
+            self._background.submit(self._authenticate, username, password, callback=lambda server, error: self._on_login(username, password, server, error))
         else:
-            if EmailApp._trials >= 2:
-                messagebox.showinfo('Help message!', "If you entered your real email and can't log in, make sure to use an app-specific password.\nFor more info, visit:\nhttps://support.google.com/accounts/answer/185833?hl=pl")
-                EmailApp._trials = 0
+            self._show_trials_help()
+
+    def _on_login(self, username, password, server, error):
+        """Switches to the email sending interface once the background login has finished."""
+        self._login_button.config(state=NORMAL)
+        self._login_status_label.config(text='')
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            messagebox.showerror('Login error!', 'Enter a valid password!')
+            self._show_trials_help()
+            return
+        if error is not None:
+            messagebox.showerror('Login error!', f'Failed to log in: {str(error)}')
+            return
+
+        self._username = username
+        self._password = password
+        self._server = server
+        self._outbox_worker = OutboxWorker(self._outbox, server, sender=username, cache=self._attachment_cache)
+        self._show_email()
+        self._schedule_heartbeat()
+        self._outbox_job = self.after(self.OUTBOX_INTERVAL, self._drain_outbox)
+        self.master.update_idletasks()
+        self.master.geometry(f'{self._email_widgets.winfo_reqwidth()}x{self._email_widgets.winfo_reqheight()}')  # type: ignore
+        self.master.resizable(False, False)  # type: ignore
+
+    def _schedule_heartbeat(self):
+        """Sends a NOOP in the background every `HEARTBEAT_INTERVAL` ms while logged in."""
+        self._heartbeat_job = self.after(self.HEARTBEAT_INTERVAL, self._heartbeat)
+
+    def _heartbeat(self):
+        """Keeps the idle session alive so the next send does not pay for a new handshake."""
+        if self._server:
+            if not self._background.pending:
+                self._background.submit(self._server.heartbeat, callback=self._on_heartbeat)
+            self._schedule_heartbeat()
+
+    def _on_heartbeat(self, _, error):
+        """Tells the user when the session could not be kept alive; the next send reconnects."""
+        if error is not None and self._server:
+            self._message_label.config(text=f'Connection lost: {str(error)}. It will be reopened for the next email.', fg='#dc3545')
+
+    def _drain_outbox(self):
+        """Periodically retries the messages waiting in the outbox while logged in."""
+        if self._outbox_worker:
+            next_due = self._outbox.next_due(self._username)
+            if next_due is not None and next_due <= time.time() and self._outbox_drain is None and not self._background.pending:
+                self._outbox_stop = threading.Event()
+                self._outbox_drain = self._background.submit(self._outbox_worker.run, self._outbox_stop, True, callback=self._on_outbox_drained, track=False)
+            self._outbox_job = self.after(self.OUTBOX_INTERVAL, self._drain_outbox)
+
+    def _on_outbox_drained(self, _, error):
+        """Reports how many messages are still waiting in the outbox."""
+        self._outbox_drain = None
+        pending = self._outbox.counts().get('pending', 0)
+        if error is None and not self._background.pending:
+            self._message_label.config(text=f'Outbox: {pending} message(s) waiting.' if pending else 'Outbox delivered.', fg='black')
+
+    def _show_connection_info(self):
+        """Shows how many handshakes the session needed and how long they took."""
+        if not self._server:
+            messagebox.showinfo('Connection info', 'Not logged in.')
+            return
+        stats = self._server.stats()
+        messagebox.showinfo('Connection info', '\n'.join(f"{key.replace('_', ' ')}: {value}" for key, value in stats.items()))
+
+    def _show_trials_help(self):
+        """Points the user to app-specific passwords after repeated failed logins."""
+        if EmailApp._trials >= 2:
+            messagebox.showinfo('Help message!', "If you entered your real email and can't log in, make sure to use an app-specific password.\nFor more info, visit:\nhttps://support.google.com/accounts/answer/185833?hl=pl")
+            EmailApp._trials = 0
 
     def _message_verification(self):
-        """Verifies the email message fields."""
+        """Verifies the email message fields; several recipients can be separated with commas or semicolons."""
         recipient_email = self._entry_for_recipients_email.get()
         subject_text = self._entry_for_email_subject.get()
         message_text = self._entry_for_email_message.get("1.0", END).strip()
@@ -205,24 +1180,41 @@ class EmailApp(Frame):
             messagebox.showerror('Email error!', "You can't leave any field blank!")
             return False
 
-        if not re.match(r'[^@\s]+@[^@\s]+\.[a-zA-Z0-9]+$', recipient_email):
-            messagebox.showerror('Email error!', "Check the recipient's email address again!")
+        valid, invalid = validate_recipients(recipient_email)
+        if invalid or not valid:
+            messagebox.showerror('Email error!', "Check the recipient's email address again!" + (f"\nInvalid: {', '.join(invalid)}" if invalid else ''))
             return False
 
         return True
 
     def _logout(self):
         """Logs out the user and returns to the login screen."""
-        try:
-            if self._server:
-                self._server.quit()
-            self._show_login()
-            self._entry_for_email.delete(0, END)
-            self._entry_for_password.delete(0, END)
-            self.master.geometry('400x400')  # type: ignore
-            self.master.resizable(False, False)  # type: ignore
-        except Exception as e:
-            messagebox.showerror('Logout error!', f'Error occurred while logging out: {str(e)}')
+        self._cancel_sending()
+        for job in (self._heartbeat_job, self._outbox_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._heartbeat_job = self._outbox_job = None
+        if self._server:
+            self._outbox_worker = None
+            self._background.submit(self._quit_server, self._server, callback=self._on_logout_error)
+            self._server = None
+        self._username = None
+        self._password = None
+        self._show_login()
+        self._entry_for_email.delete(0, END)
+        self._entry_for_password.delete(0, END)
+        self.master.geometry('400x400')  # type: ignore
+        self.master.resizable(False, False)  # type: ignore
+
+    def _quit_server(self, server):
+        """Closes the SMTP session once any in-flight message has been handed over. Runs in the background."""
+        with self._send_lock:
+            server.close()
+
+    def _on_logout_error(self, _, error):
+        """Reports a failure to close the SMTP session cleanly."""
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            messagebox.showerror('Logout error!', f'Error occurred while logging out: {str(error)}')
 
     def _reset_fields(self):
         """Resets the recipient email, subject, and message fields."""
@@ -230,46 +1222,284 @@ class EmailApp(Frame):
         self._entry_for_email_subject.delete(0, END)
         self._entry_for_email_message.delete("1.0", END)
         self._file_label.config(text='No file selected')
-        self._attachment_path = None
+        self._attachment_paths = []
         self._message_label.config(text='')
 
     def _send_email(self):
-        """Sends an email if all fields are valid."""
+        """Queues the email for sending in the background if all fields are valid."""
         if self._message_verification():
-            recipient = self._entry_for_recipients_email.get()
+            recipient = ', '.join(validate_recipients(self._entry_for_recipients_email.get())[0])
             subject = self._entry_for_email_subject.get()
             message_content = self._entry_for_email_message.get("1.0", END)
-            msg = MIMEMultipart()
-            msg['From'] = self._username  # type: ignore
-            msg['To'] = recipient
-            msg['Subject'] = subject
-            msg.attach(MIMEText(message_content, 'plain'))
-            if self._attachment_path:
-                try:
-                    mime_type, _ = mimetypes.guess_type(self._attachment_path)
-                    if mime_type is None:
-                        mime_type = 'application/octet-stream'
-                    maintype, subtype = mime_type.split('/', 1)
-                    with open(self._attachment_path, 'rb') as attachment:
-                        part = MIMEBase(maintype, subtype)
-                        part.set_payload(attachment.read())
-                        encoders.encode_base64(part)
-                        filename = os.path.basename(self._attachment_path)
-                        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-                        msg.attach(part)
-                except Exception as e:
-                    messagebox.showerror('Attachment error!', f'Error attaching file: {str(e)}')
-                    return
+            cancelled = threading.Event()
+            self._send_cancels.add(cancelled)
+            fields = (self._username, recipient, subject, message_content, list(self._attachment_paths))
+            self._background.submit(self._deliver, self._server, *fields, cancelled, callback=lambda _, error: self._on_sent(fields, cancelled, error))
+            self._update_progress()
+
+    def _deliver(self, server, sender, recipient, subject, body, attachment_paths, cancelled):
+        """Builds and sends one message unless `cancelled` is set first. Runs in the background, so several messages can be prepared at once."""
+        msg = build_message(sender, recipient, subject, body, attachment_paths, self._attachment_cache)
+        with self._send_lock:
+            # Checked under the lock: a message that is already being sent goes out and is reported as sent.
+            if cancelled.is_set():
+                raise SendCancelled()
+            server.send_message(msg)
+        return recipient
+
+    def _on_sent(self, fields, cancelled, error):
+        """Reports the outcome of a background send on the Tk thread, keeping transient failures in the outbox."""
+        recipient = fields[1]
+        self._send_cancels.discard(cancelled)
+        self._update_progress()
+        if isinstance(error, SendCancelled):
+            self._message_label.config(text='Sending cancelled.', fg='black')
+        elif isinstance(error, AttachmentError):
+            messagebox.showerror('Attachment error!', f'Error attaching file: {str(error)}')
+        elif error is not None and is_transient_error(error):
+            self._outbox.enqueue(*fields)
+            self._message_label.config(text='Sending failed, the email was saved to the outbox and will be retried.', fg='#dc3545')
+        elif error is not None:
+            messagebox.showerror('Sending error!', f'Error sending email: {str(error)}')
+        else:
+            self._message_label.config(text=f'Email sent to {recipient}!', fg='green')
+
+    def _cancel_sending(self):
+        """Cancels messages that have not been handed over to the server yet and stops a running outbox drain."""
+        for cancelled in self._send_cancels:
+            cancelled.set()
+        self._outbox_stop.set()
+
+    def _update_progress(self):
+        """Shows the progress bar and Cancel button while messages are in flight."""
+        if self._background.pending:
+            self._message_label.config(text=f'Sending {self._background.pending} message(s)...', fg='black')
+            self._progress_bar.grid(row=7, column=0, columnspan=2, pady=5, padx=(0, 10), sticky='ew')
+            self._cancel_button.grid(row=7, column=2, pady=5, sticky='w')
+            self._progress_bar.start(10)
+        else:
+            self._progress_bar.stop()
+            self._progress_bar.grid_remove()
+            self._cancel_button.grid_remove()
+
+def _password_from_args(args):
+    """Returns the SMTP password given on the command line, prompting for it when a username needs one."""
+    if args.username and args.password is None:
+        return getpass.getpass('SMTP password: ')
+    return args.password
+
+
+def _run_outbox(args):
+    """Adds messages to, reports on, or drains the outbox from the command line."""
+    outbox = Outbox(args.db)
+    try:
+        if args.action == 'add':
+            with open(args.body, 'r', encoding='utf-8') as file:
+                body = file.read()
+            message_id = outbox.enqueue(args.sender, args.recipient, args.subject, body, args.attach)
+            print(f'Queued message {message_id}.')
+        elif args.action == 'run':
+            session = SMTPSession(args.username, _password_from_args(args), host=args.host, port=args.port, use_tls=not args.no_tls)
+            session.connect()
+            worker = OutboxWorker(outbox, session, per_minute=args.per_minute, max_attempts=args.max_attempts, base_delay=args.base_delay,
+                                  sender=args.username or None, cache=AttachmentCache(ATTACHMENT_CACHE_DIR))
             try:
-                self._server.send_message(msg)  # type: ignore
-                self._message_label.config(text='Email sent!', fg='green')
-            except Exception as e:
-                messagebox.showerror('Sending error!', f'Error sending email: {str(e)}')
+                worker.run(drain=args.drain)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                session.close()
+            print(f'Sent: {worker.sent}, failed: {worker.failed}, retries scheduled: {worker.retried}')
+        counts = outbox.counts()
+        print(', '.join(f'{status}: {counts.get(status, 0)}' for status in ('pending', 'sending', 'sent', 'failed')))
+    finally:
+        outbox.close()
+
+
+def _run_bulk(args):
+    """Runs a mail-merge campaign from the command line and prints its report."""
+    password = _password_from_args(args)
+    with open(args.body, 'r', encoding='utf-8') as file:
+        body_template = file.read()
+
+    pool = SMTPConnectionPool(args.username, password, host=args.host, port=args.port, size=args.connections, max_messages=args.per_connection, use_tls=not args.no_tls)
+    cache = AttachmentCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.attach else None
+    merge = MailMerge(pool, args.sender or args.username, args.subject, body_template, attachment_paths=args.attach, retries=args.retries, cache=cache)
+    report = merge.run(load_recipients(args.recipients))
+
+    print(f"Sent: {report['sent']}, failed: {report['failed']}, retries: {report['retries']}, connections: {report['connections']}")
+    print(f"Elapsed: {report['seconds']} s ({report['messages_per_sec']} messages/sec)")
+    if report['cache']:
+        print(f"Attachment cache: {report['cache']['hits']} hits, {report['cache']['misses']} misses")
+    for recipient, error in report['errors']:
+        print(f'  {recipient}: {error}')
+
+
+def _read_addresses(path):
+    """Yields the lines of an address list file."""
+    with open(path, 'r', encoding='utf-8') as file:
+        yield from file
+
+
+def _run_validate(args):
+    """Validates an address list and writes the valid addresses, one per line."""
+    resolver = DomainResolver() if args.check_domains else None
+    valid, invalid = validate_recipients(_read_addresses(args.addresses), resolver)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.writelines(f'{address}\n' for address in valid)
+    else:
+        sys.stdout.writelines(f'{address}\n' for address in valid)
+    print(f'Valid: {len(valid)}, invalid: {len(invalid)}', file=sys.stderr)
+    for address in invalid[:20]:
+        print(f'  {address}', file=sys.stderr)
+
+
+def _run_validate_benchmark(args):
+    """Times `validate_recipients` on a generated list with duplicates, invalid entries and multi-address lines."""
+    lines = []
+    for i in range(args.count):
+        if i % 10 == 0:
+            lines.append(f'User{i // 20}@Example.com')
+        elif i % 10 == 1:
+            lines.append(f'broken{i}.example.com')
+        elif i % 10 == 2:
+            lines.append(f'a{i}@example.org; b{i}@example.net')
+        else:
+            lines.append(f'user{i}@example.com')
+
+    for label, resolver in (('pattern only', None), ('with domain check', DomainResolver(lambda domain: domain != 'example.net'))):
+        start = time.perf_counter()
+        valid, invalid = validate_recipients(lines, resolver)
+        elapsed = time.perf_counter() - start
+        print(f'{label}: {len(lines)} lines -> {len(valid)} valid, {len(invalid)} invalid in {elapsed:.2f} s ({len(lines) / elapsed:,.0f} lines/sec)')
+
+
+def _run_attachment_benchmark(args):
+    """Measures time and peak RSS of serializing messages with large attachments."""
+    import resource  # Unix only, so it is not imported for the GUI.
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+
+    def peak_rss_mb():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def legacy_message(sender, recipient, subject, body, attachment_paths):
+        """Builds a message the way the app used to, with every attachment read and encoded in memory."""
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        for path in attachment_paths:
+            with open(path, 'rb') as attachment:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(attachment.read())
+                encoders.encode_base64(part)
+                part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(path)}"')
+                msg.attach(part)
+        return msg
+
+    print(f'{"size MB":>8} {"mode":>10} {"seconds":>8} {"peak RSS MB":>12}')
+    for size_mb in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix='.bin') as attachment, open(os.devnull, 'wb') as sink:
+            block = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                attachment.write(block)
+            attachment.flush()
+
+            start = time.perf_counter()
+            StreamingMessage('a@example.com', 'b@example.com', 'Benchmark', 'Body', [attachment.name]).write_to(sink)
+            print(f'{size_mb:>8} {"streaming":>10} {time.perf_counter() - start:>8.2f} {peak_rss_mb():>12.1f}')
+
+            if args.legacy:
+                # ru_maxrss is a high-water mark, so the in-memory path has to be measured last.
+                start = time.perf_counter()
+                sink.write(legacy_message('a@example.com', 'b@example.com', 'Benchmark', 'Body', [attachment.name]).as_bytes())
+                print(f'{size_mb:>8} {"in-memory":>10} {time.perf_counter() - start:>8.2f} {peak_rss_mb():>12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send emails through SMTP. Without a command the GUI is started.')
+    commands = parser.add_subparsers(dest='command')
+
+    connection = argparse.ArgumentParser(add_help=False)
+    connection.add_argument('-u', '--username', default='', help='SMTP login.')
+    connection.add_argument('-p', '--password', help='SMTP password (prompted for when omitted).')
+    connection.add_argument('--host', default=SMTP_HOST, help='SMTP server host.')
+    connection.add_argument('--port', type=int, default=SMTP_PORT, help='SMTP server port.')
+    connection.add_argument('--no-tls', action='store_true', help='Do not use STARTTLS (e.g. for a local test server).')
+
+    bulk = commands.add_parser('bulk', parents=[connection], help='Send a mail-merge campaign without the GUI.')
+    bulk.add_argument('recipients', help='CSV (with header) or JSONL file with recipient rows; each row needs an "email" field.')
+    bulk.add_argument('-s', '--subject', required=True, help='Subject template, e.g. "Hello $name".')
+    bulk.add_argument('-b', '--body', required=True, help='Path to the body template file.')
+    bulk.add_argument('--sender', help='From address (defaults to the username).')
+    bulk.add_argument('--attach', action='append', default=[], help='Path to a file attached to every message (can be repeated).')
+    bulk.add_argument('--cache-dir', default=ATTACHMENT_CACHE_DIR, help='Directory of the encoded attachment cache.')
+    bulk.add_argument('--cache-size', type=int, default=512, help='Maximum size of the attachment cache in MB.')
+    bulk.add_argument('--connections', type=int, default=4, help='Number of concurrent SMTP connections.')
+    bulk.add_argument('--per-connection', type=int, default=100, help='Messages sent over a connection before it is replaced.')
+    bulk.add_argument('--retries', type=int, default=2, help='Retries per message on transient errors.')
+
+    outbox = commands.add_parser('outbox', help='Manage and deliver the durable outbox without the GUI.')
+    outbox.add_argument('--db', default=OUTBOX_PATH, help='Path to the outbox database.')
+    outbox_actions = outbox.add_subparsers(dest='action', required=True)
+    outbox_actions.add_parser('status', help='Show how many messages are in each state.')
+    add = outbox_actions.add_parser('add', help='Queue a message.')
+    add.add_argument('recipient', help="Recipient's email.")
+    add.add_argument('--sender', required=True, help='From address.')
+    add.add_argument('-s', '--subject', required=True, help='Email subject.')
+    add.add_argument('-b', '--body', required=True, help='Path to the message body file.')
+    add.add_argument('--attach', action='append', default=[], help='Path to an attached file (can be repeated).')
+    run = outbox_actions.add_parser('run', parents=[connection], help='Send the queued messages of the logged-in sender (all of them without --username), retrying transient failures.')
+    run.add_argument('--per-minute', type=int, default=20, help='Maximum number of messages sent per minute (0 disables the limit).')
+    run.add_argument('--max-attempts', type=int, default=6, help='Attempts before a message is marked as failed.')
+    run.add_argument('--base-delay', type=float, default=30, help='Delay in seconds before the first retry; doubled for every further retry.')
+    run.add_argument('--drain', action='store_true', help='Exit once nothing is pending instead of waiting for new messages.')
+
+    validate = commands.add_parser('validate', help='Validate and deduplicate an address list.')
+    validate.add_argument('addresses', help='File with addresses, one or more per line separated by commas or semicolons.')
+    validate.add_argument('-o', '--output', help='Where to write the valid addresses (defaults to stdout).')
+    validate.add_argument('--check-domains', action='store_true', help='Also reject addresses whose domain does not resolve.')
+
+    bench_validate = commands.add_parser('bench-validate', help='Measure address validation throughput.')
+    bench_validate.add_argument('--count', type=int, default=1000000, help='Number of generated lines.')
+
+    bench = commands.add_parser('bench-attachment', help='Measure peak memory of sending large attachments.')
+    bench.add_argument('sizes', type=int, nargs='+', help='Attachment sizes in MB, e.g. 100 1024.')
+    bench.add_argument('--legacy', action='store_true', help='Also measure the old in-memory encoding (run with one size at a time).')
+    args = parser.parse_args()
+
+    if args.command == 'outbox':
+        _run_outbox(args)
+        return
+
+    if args.command == 'validate':
+        _run_validate(args)
+        return
+
+    if args.command == 'bench-validate':
+        _run_validate_benchmark(args)
+        return
+
+    if args.command == 'bench-attachment':
+        _run_attachment_benchmark(args)
+        return
+
+    if args.command == 'bulk':
+        if not args.sender and not args.username:
+            bulk.error('either --sender or --username is required')
+        _run_bulk(args)
+        return
 
-if __name__ == "__main__":
     root = Tk()
     root.title('Email Sender App')
     root.geometry('400x400')
     root.resizable(False, False)
     app = EmailApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
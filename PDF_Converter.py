@@ -1,11 +1,578 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import queue
+import sqlite3
 import PyPDF2
+import argparse
+import threading
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from tkinter import * # type: ignore
 from tkinter import filedialog
 from tkinter import messagebox
+from tkinter import ttk
+
+
+EXTRACTION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdf_converter")
+SEARCH_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".pdf_converter_index.sqlite3")
+
+
+class ConversionCancelled(Exception):
+    """Raised when a conversion is cancelled before it has finished."""
+
+
+class PageRangeError(ValueError):
+    """Raised when a page range is malformed or outside of the document."""
+
+
+@lru_cache(maxsize=1)
+def _worker_reader(pdf_path):
+    """Opens a PDF file once per worker process, so consecutive ranges do not re-parse it."""
+    return PyPDF2.PdfReader(pdf_path)
+
+
+def _extract_range(pdf_path, start, stop):
+    """Extracts the text of pages [start, stop). Runs in a worker process."""
+    pdf_reader = _worker_reader(pdf_path)
+    return [pdf_reader.pages[index].extract_text() for index in range(start, stop)]
+
+
+def page_count(pdf_path):
+    """Returns the number of pages of a PDF file."""
+    return len(PyPDF2.PdfReader(pdf_path).pages)
+
+
+def parse_page_range(text, total):
+    """
+    Turns a 1-based, inclusive page range such as "10-20", "5", "10-" or "-20" into a 0-based
+    (start, stop) pair. An empty text selects every page.
+    """
+    text = text.strip()
+    if not text:
+        return 0, total
+    first, dash, last = text.partition("-")
+    try:
+        start = int(first) if first.strip() else 1
+        stop = (int(last) if last.strip() else total) if dash else start
+    except ValueError:
+        raise PageRangeError(f"'{text}' is not a page range like 10-20.") from None
+    if not 1 <= start <= stop <= total:
+        raise PageRangeError(f"Pages {text} are outside of the document, which has {total} pages.")
+    return start - 1, stop
+
+
+def _first_page(page_range):
+    """Returns the 1-based number of the first page of a page range, which does not depend on the page count."""
+    if page_range is None:
+        return 1
+    if isinstance(page_range, str):
+        return parse_page_range(page_range, sys.maxsize)[0] + 1
+    return page_range[0] + 1
+
+
+def _resolve_range(page_range, total):
+    """Returns the 0-based (start, stop) pair of a page range given as such a pair, as text for `parse_page_range` or as None."""
+    if page_range is None or isinstance(page_range, str):
+        return parse_page_range(page_range or "", total)
+    return page_range
+
+
+def extract_pages(pdf_path, workers=None, chunk_size=8, progress=None, cancel=None, page_range=None):
+    """
+    Yields the text of the pages of a PDF file in page order.
+
+    `page_range` is a 0-based (start, stop) pair or a text such as "10-20" that is checked against
+    the page count read here, so the file is not parsed an extra time; every page by default.
+    Only the selected pages are extracted, although PyPDF2 still reads the whole page tree.
+    Page ranges of `chunk_size` pages are extracted in parallel by a pool of `workers` processes
+    (one per CPU by default; 1 extracts in this process). Only a few ranges are in flight at a
+    time, so finished pages are yielded as soon as all pages before them are done.
+    `progress(done, total)` is called after every range and setting the `cancel` event stops
+    the extraction with `ConversionCancelled`.
+    """
+    pdf_reader = PyPDF2.PdfReader(pdf_path)
+    first, last = _resolve_range(page_range, len(pdf_reader.pages))
+    total = last - first
+    workers = workers or os.cpu_count() or 1
+    ranges = deque((start, min(start + chunk_size, last)) for start in range(first, last, chunk_size))
+
+    if workers == 1 or total <= chunk_size:
+        for index in range(first, last):
+            if cancel is not None and cancel.is_set():
+                raise ConversionCancelled()
+            yield pdf_reader.pages[index].extract_text()
+            if progress is not None:
+                progress(index - first + 1, total)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < workers * 2:
+                    start, stop = ranges.popleft()
+                    in_flight.append((stop, executor.submit(_extract_range, pdf_path, start, stop)))
+                stop, future = in_flight.popleft()
+                yield from future.result()
+                if progress is not None:
+                    progress(stop - first, total)
+                if cancel is not None and cancel.is_set():
+                    raise ConversionCancelled()
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+
+def write_pages(pages, output, separator="", offsets=None, first_page=1):
+    """
+    Writes page texts to the binary file `output` one page at a time and returns the number of pages.
+
+    `separator` is written between pages; "{page}" in it is replaced with the number of the page
+    that follows in the document, counting the first page written as `first_page`. If an `offsets`
+    text file is given, the byte offset at which each written page's text starts is written to it,
+    one per line, so memory use does not grow with the page count.
+    """
+    position = 0
+    count = 0
+    for count, text in enumerate(pages, start=1):
+        if count > 1 and separator:
+            data = separator.replace("{page}", str(first_page + count - 1)).encode("utf-8")
+            output.write(data)
+            position += len(data)
+        if offsets is not None:
+            offsets.write(f"{position}\n")
+        data = text.encode("utf-8")
+        output.write(data)
+        position += len(data)
+    return count
+
+
+def _report_progress(pages, total, progress=None, cancel=None):
+    """Passes pages through, reporting progress and honouring cancellation like `extract_pages` does."""
+    for number, text in enumerate(pages, start=1):
+        if cancel is not None and cancel.is_set():
+            raise ConversionCancelled()
+        yield text
+        if progress is not None:
+            progress(number, total)
+
+
+def convert_pdf(pdf_path, txt_path, workers=None, progress=None, cancel=None, separator="", offsets_path=None, cache=None, page_range=None, search_index=None):
+    """
+    Writes the text of a PDF file to `txt_path` page by page and returns the number of pages.
+    `page_range` selects the pages to convert as in `extract_pages`, every page by default.
+    With `offsets_path`, the byte offset of every converted page is written there (see `write_pages`);
+    "{page}" in `separator` is the page's number in the whole document, also with a range.
+    With an `ExtractionCache`, a file that was converted before is not parsed again; only
+    whole-document conversions are added to the cache.
+    With a `SearchIndex`, the pages of a whole-document conversion are indexed as they are written.
+    A cancelled or failed conversion leaves no output behind.
+    """
+    written = [txt_path] + ([offsets_path] if offsets_path else [])
+    try:
+        with open(txt_path, "wb") as f, open(offsets_path or os.devnull, "w", encoding="utf-8") as offsets:
+            digest = file_digest(pdf_path) if cache is not None or search_index is not None else None
+            index = cache.lookup(digest) if cache is not None else None
+            if index is not None:
+                start, stop = _resolve_range(page_range, index["pages"])
+                pages = _report_progress(cache.read(digest, index, start, stop), stop - start, progress, cancel)
+            else:
+                pages = extract_pages(pdf_path, workers, progress=progress, cancel=cancel, page_range=page_range)
+                if cache is not None and page_range is None:
+                    pages = cache.store(digest, pages)
+            if search_index is not None and page_range is None and not search_index.is_current(pdf_path, digest):
+                pages = search_index.store(pdf_path, digest, pages)
+            return write_pages(pages, f, separator, offsets if offsets_path else None, _first_page(page_range))
+    except Exception:
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+def read_pages(txt_path, offsets_path):
+    """Yields the pages of a text file written with an offsets file (see `write_pages`)."""
+    with open(offsets_path, "r", encoding="utf-8") as offsets:
+        starts = [int(line) for line in offsets]
+    with open(txt_path, "rb") as f:
+        for start, stop in zip(starts, starts[1:] + [os.path.getsize(txt_path)]):
+            f.seek(start)
+            yield f.read(stop - start).decode("utf-8")
+
+
+def file_digest(path):
+    """Returns the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dump_json(data, path):
+    """Writes JSON to a file, replacing the old file atomically."""
+    descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with open(descriptor, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def _private_directory(path):
+    """Creates a directory that only the current user can access, refusing one that belongs to someone else."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        stat = os.stat(path)
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f"'{path}' belongs to another user.")
+        if stat.st_mode & 0o077:
+            os.chmod(path, 0o700)
+
+
+class ExtractionCache:
+    """
+    Size-bounded on-disk cache of extracted page text, keyed by the SHA-256 of the PDF content.
+
+    An entry is a `<digest>.txt` file with the UTF-8 text of all pages back to back and a
+    `<digest>.json` index with the page count and the byte offset of every page, so re-converting
+    a file, or exporting only some of its pages, reads just the bytes it needs. The least recently
+    used entries are evicted once the cache grows beyond `max_bytes`. The cache directory must
+    belong to the current user and is kept private, since it holds the text of every converted file.
+    """
+
+    def __init__(self, directory=EXTRACTION_CACHE_DIR, max_bytes=1024 * 1024 * 1024):
+        """Opens (or creates) the cache directory and loads its statistics."""
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._stats_path = os.path.join(directory, "stats.json")
+        _private_directory(directory)
+        self._counters = {"hits": 0, "misses": 0}
+        if os.path.exists(self._stats_path):
+            with open(self._stats_path, "r", encoding="utf-8") as f:
+                self._counters.update(json.load(f))
+
+    def _path(self, digest, extension):
+        """Returns the path of one file of an entry."""
+        return os.path.join(self._directory, f"{digest}.{extension}")
+
+    def lookup(self, digest):
+        """Returns the index of a cached entry and marks it as recently used, or returns None on a miss."""
+        try:
+            with open(self._path(digest, "json"), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            complete = os.path.getsize(self._path(digest, "txt")) == index["offsets"][-1]
+        except (OSError, ValueError, LookupError, TypeError):
+            complete = False
+        if not complete:
+            # A missing, partial or unreadable entry is dropped, so the file is extracted again.
+            self._remove(digest)
+            self._count("misses")
+            return None
+        os.utime(self._path(digest, "json"))
+        self._count("hits")
+        return index
+
+    def read(self, digest, index, start=0, stop=None):
+        """Yields the cached text of pages [start, stop)."""
+        offsets = index["offsets"]
+        stop = index["pages"] if stop is None else min(stop, index["pages"])
+        with open(self._path(digest, "txt"), "rb") as f:
+            f.seek(offsets[start])
+            for number in range(start, stop):
+                yield f.read(offsets[number + 1] - offsets[number]).decode("utf-8")
+
+    def store(self, digest, pages):
+        """Passes pages through while saving them; the entry is kept only if every page went through."""
+        # A temporary file of its own, so conversions of the same file in other processes cannot interleave with this one.
+        descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=self._directory)
+        offsets = [0]
+        with open(descriptor, "wb") as f:
+            try:
+                for text in pages:
+                    data = text.encode("utf-8")
+                    f.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                    yield text
+            except BaseException:
+                f.close()
+                os.remove(temporary_path)
+                raise
+        os.replace(temporary_path, self._path(digest, "txt"))
+        _dump_json({"pages": len(offsets) - 1, "offsets": offsets}, self._path(digest, "json"))
+        self._evict()
+
+    def _remove(self, digest):
+        """Deletes both files of an entry, ignoring files that are already gone."""
+        for extension in ("json", "txt"):
+            try:
+                os.remove(self._path(digest, extension))
+            except OSError:
+                pass
+
+    def _entries(self):
+        """Returns (last use, digest, size) of every complete entry."""
+        entries = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(".json") and entry.name != "stats.json":
+                digest = entry.name[:-5]
+                try:
+                    entries.append((entry.stat().st_mtime, digest, entry.stat().st_size + os.path.getsize(self._path(digest, "txt"))))
+                except OSError:
+                    continue
+        return entries
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in its size limit."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, digest, size in entries[:-1]:
+            if total <= self._max_bytes:
+                break
+            self._remove(digest)
+            total -= size
+
+    def _count(self, counter):
+        """Increments a hit/miss counter and saves the counters."""
+        self._counters[counter] += 1
+        _dump_json(self._counters, self._stats_path)
+
+    def stats(self):
+        """Returns the hit/miss counters, the number of entries and their total size."""
+        entries = self._entries()
+        return {**self._counters, "entries": len(entries), "bytes": sum(size for _, _, size in entries)}
+
+
+class SearchIndex:
+    """
+    Full-text index of converted PDF files, kept in an SQLite FTS5 table with one row per page.
+
+    The rowid of a page row packs the document id and the page number (`PAGE_BITS` bits), so the
+    postings carry no extra columns and the pages of a document are one contiguous rowid range.
+    Documents are keyed by path and the SHA-256 of the PDF: indexing an unchanged file is skipped
+    and indexing a changed one replaces its pages, so newly converted files can be added at any time.
+    """
+
+    PAGE_BITS = 20
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        """Opens (or creates) the index database."""
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                sha256 TEXT NOT NULL,
+                page_count INTEGER NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text);
+        """)
+
+    def is_current(self, pdf_path, digest):
+        """Tells whether the file is indexed with the given content."""
+        row = self._connection.execute("SELECT sha256 FROM documents WHERE path = ?", (os.path.abspath(pdf_path),)).fetchone()
+        return row is not None and row[0] == digest
+
+    def store(self, pdf_path, digest, pages):
+        """Passes pages through while indexing them; the index changes only if every page went through."""
+        path = os.path.abspath(pdf_path)
+        try:
+            row = self._connection.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                document = self._connection.execute("INSERT INTO documents (path, sha256, page_count) VALUES (?, ?, 0)", (path, digest)).lastrowid
+            else:
+                document = row[0]
+                self._connection.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?", (document << self.PAGE_BITS, ((document + 1) << self.PAGE_BITS) - 1))
+            count = 0
+            for count, text in enumerate(pages, start=1):
+                if count >= 1 << self.PAGE_BITS:
+                    raise ValueError(f"{pdf_path} has too many pages to index.")
+                self._connection.execute("INSERT INTO pages (rowid, text) VALUES (?, ?)", ((document << self.PAGE_BITS) | count, text))
+                yield text
+            self._connection.execute("UPDATE documents SET sha256 = ?, page_count = ? WHERE id = ?", (digest, count, document))
+        except BaseException:
+            self._connection.rollback()
+            raise
+        self._connection.commit()
+
+    def add(self, pdf_path, digest, pages):
+        """Indexes the pages of a file."""
+        for _ in self.store(pdf_path, digest, pages):
+            pass
+
+    def search(self, query, limit=20):
+        """Returns (pdf_path, page_number, snippet) of the best matching pages for an FTS5 query."""
+        rows = self._connection.execute(
+            "SELECT documents.path, pages.rowid, snippet(pages, 0, '[', ']', '...', 12) FROM pages "
+            "JOIN documents ON documents.id = pages.rowid >> ? WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+            (self.PAGE_BITS, query, limit))
+        return [(path, rowid & ((1 << self.PAGE_BITS) - 1), snippet) for path, rowid, snippet in rows]
+
+    def close(self):
+        """Closes the database."""
+        self._connection.close()
+
+
+def _walk_pdfs(paths):
+    """Yields (pdf_path, relative_txt_path) pairs, naming every output after the file's path below its input."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        pdf_path = os.path.join(directory, name)
+                        yield pdf_path, os.path.splitext(os.path.relpath(pdf_path, path))[0] + ".txt"
+        else:
+            yield path, os.path.splitext(os.path.basename(path))[0] + ".txt"
+
+
+def find_pdfs(inputs, manifest=None):
+    """
+    Yields (pdf_path, relative_txt_path) pairs for every PDF file below the given directories,
+    every PDF file given directly, and every path listed (one per line) in the manifest file.
+
+    A file that is listed more than once is converted once. When two different files would get the
+    same output name, e.g. two `report.pdf` files from different folders, the later one gets a
+    numbered name (`report-2.txt`), so no two conversions ever write the same file.
+    """
+    paths = list(inputs)
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    seen = set()
+    used = set()
+    for pdf_path, txt_path in _walk_pdfs(paths):
+        if os.path.abspath(pdf_path) in seen:
+            continue
+        seen.add(os.path.abspath(pdf_path))
+        base, extension = os.path.splitext(txt_path)
+        number = 1
+        while os.path.normcase(txt_path) in used:
+            number += 1
+            txt_path = f"{base}-{number}{extension}"
+        used.add(os.path.normcase(txt_path))
+        yield pdf_path, txt_path
+
+
+def _convert_job(pdf_path, txt_path, offsets_path=None):
+    """Converts one file of a batch. Runs in a worker process."""
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(txt_path) or ".", exist_ok=True)
+    pages = convert_pdf(pdf_path, txt_path, workers=1, offsets_path=offsets_path)
+    return {"pages": pages, "bytes": os.path.getsize(txt_path), "seconds": round(time.perf_counter() - start, 3), "sha256": file_digest(pdf_path)}
+
+
+class BatchConverter:
+    """
+    Converts many PDF files to text with a bounded pool of worker processes.
+
+    The size, mtime and hash of every converted file are kept in a state file in the output
+    directory, so files that have not changed since the last run are skipped. Every file gets a
+    line in the JSONL report with its page count, output bytes, duration and error, if any.
+    With a `SearchIndex`, converted files are indexed as their results come in, and files that
+    are missing from the index are converted again even if they have not changed.
+    """
+
+    STATE_FILE = ".pdf_converter_state.json"
+
+    def __init__(self, output_dir, workers=None, force=False, search_index=None):
+        """Loads the state of previous runs from the output directory."""
+        self._output_dir = output_dir
+        self._workers = workers or os.cpu_count() or 1
+        self._force = force
+        self._search_index = search_index
+        self._state_path = os.path.join(output_dir, self.STATE_FILE)
+        self._state = {}
+        if os.path.exists(self._state_path):
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        self.counts = {"converted": 0, "skipped": 0, "error": 0}
+
+    def _is_unchanged(self, pdf_path, txt_path):
+        """Tells whether a file was already converted and has not changed since."""
+        known = self._state.get(os.path.abspath(pdf_path))
+        if self._force or known is None or not os.path.exists(txt_path):
+            return False
+        if self._search_index is not None and not self._search_index.is_current(pdf_path, known["sha256"]):
+            return False
+        stat = os.stat(pdf_path)
+        if (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        if known["size"] == stat.st_size and known["sha256"] == file_digest(pdf_path):
+            known["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def run(self, pairs, report):
+        """Converts every (pdf_path, relative_txt_path) pair and writes one JSON line per file to `report`."""
+        os.makedirs(self._output_dir, exist_ok=True)
+        try:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                in_flight = {}
+                for pdf_path, relative_txt_path in pairs:
+                    txt_path = os.path.join(self._output_dir, relative_txt_path)
+                    try:
+                        stat = os.stat(pdf_path)
+                        unchanged = self._is_unchanged(pdf_path, txt_path)
+                    except OSError as e:
+                        self._record(report, pdf_path, txt_path, {"error": str(e)})
+                        continue
+                    if unchanged:
+                        self._record(report, pdf_path, txt_path, {"status": "skipped"})
+                        continue
+                    if len(in_flight) >= self._workers * 2:
+                        self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, report)
+                    offsets_path = txt_path + ".offsets" if self._search_index is not None else None
+                    in_flight[executor.submit(_convert_job, pdf_path, txt_path, offsets_path)] = (pdf_path, txt_path, stat)
+                self._collect(list(in_flight), in_flight, report)
+        finally:
+            self._save_state()
+
+    def _collect(self, futures, in_flight, report):
+        """Records the outcome of finished conversions."""
+        for future in futures:
+            pdf_path, txt_path, stat = in_flight.pop(future)
+            try:
+                result = future.result()
+                if self._search_index is not None:
+                    self._index(pdf_path, txt_path, result["sha256"])
+            except Exception as e:
+                self._record(report, pdf_path, txt_path, {"error": str(e)})
+                continue
+            self._state[os.path.abspath(pdf_path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": result.pop("sha256")}
+            self._record(report, pdf_path, txt_path, result)
+
+    def _index(self, pdf_path, txt_path, digest):
+        """Adds the pages of a converted file to the search index and removes its offsets file."""
+        offsets_path = txt_path + ".offsets"
+        try:
+            self._search_index.add(pdf_path, digest, read_pages(txt_path, offsets_path))
+        finally:
+            os.remove(offsets_path)
+
+    def _record(self, report, pdf_path, txt_path, result):
+        """Writes one report line and updates the counters."""
+        status = result.pop("status", "error" if "error" in result else "converted")
+        self.counts[status] += 1
+        report.write(json.dumps({"pdf": pdf_path, "output": txt_path, "status": status, **result}) + "\n")
+        report.flush()
+
+    def _save_state(self):
+        """Stores the state for the next run, replacing the old file atomically."""
+        _dump_json(self._state, self._state_path)
+
 
 class PDFConverterApp(Frame):
     """Main application class for converting PDF files to text.
-    
+
     Inherits from the Frame class from tkinter, creating a GUI interface
     for selecting a PDF file, converting it to text, and saving the result.
     """
@@ -14,6 +581,9 @@ class PDFConverterApp(Frame):
         super().__init__(master)
         self.grid()
         self._pdf_file_path = None
+        self._cancel_event = None
+        self._events = queue.Queue()
+        self._cache = ExtractionCache()
         self._create_widgets()
 
     def _create_widgets(self):
@@ -38,8 +608,23 @@ class PDFConverterApp(Frame):
         self._pdf_file_label = Label(self, text="", font=("Calibri", 8), anchor="w", wraplength=300, padx=5)
         self._pdf_file_label.grid(row=2, pady=(0, 5), padx=10)
 
+        self._range_frame = Frame(self)
+        self._range_frame.grid(row=3, pady=(0, 5))
+        self._range_label = Label(self._range_frame, text="Pages (e.g. 10-20, empty for all):", font=("Calibri", 10))
+        self._range_label.pack(side=LEFT)
+        self._entry_for_range = Entry(self._range_frame, width=10)
+        self._entry_for_range.pack(side=LEFT, padx=5)
+
+        self._index_var = BooleanVar(value=False)
+        self._index_checkbutton = Checkbutton(self, text="Add to search index", font=("Calibri", 10), variable=self._index_var)
+        self._index_checkbutton.grid(row=4, pady=(0, 5))
+
         self._change_button = Button(self, text="Convert to Text", font=("Calibri", 12), pady=5, padx=10, command=self._change_format)
-        self._change_button.grid(row=3, pady=(0, 5))
+        self._change_button.grid(row=5, pady=(0, 5))
+
+        self._progress_bar = ttk.Progressbar(self, length=250, mode="determinate")
+        self._progress_label = Label(self, text="", font=("Calibri", 8))
+        self._cancel_button = Button(self, text="Cancel", font=("Calibri", 10), command=self._cancel_conversion)
 
     def _pick_pdf_file(self):
         """Allows the user to select a PDF file using a file dialog."""
@@ -57,36 +642,268 @@ class PDFConverterApp(Frame):
             messagebox.showinfo("Help", "Click 'Convert to Text' to convert the selected PDF file into a text file.")
 
     def _change_format(self):
-        """Converts the selected PDF file to a text file and saves the result."""
+        """Asks where to save the text and converts the selected PDF file in the background."""
         if not self._pdf_file_path:
             messagebox.showerror("File Error", "Please select a PDF file first!")
             return
 
+        txt_file = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text file", "*.txt"), ("Microsoft Word", "*.doc"), ("OpenDocument", "*.odt"), ("All files", ".*")])
+        if not txt_file:
+            return
+
+        self._cancel_event = threading.Event()
+        self._change_button.config(state=DISABLED)
+        self._choose_file_button.config(state=DISABLED)
+        self._progress_bar.config(value=0)
+        self._progress_label.config(text="Reading the PDF file...")
+        self._progress_bar.grid(row=6, pady=(0, 2))
+        self._progress_label.grid(row=7)
+        self._cancel_button.grid(row=8, pady=(2, 5))
+        threading.Thread(target=self._convert_in_background, args=(self._pdf_file_path, txt_file, self._entry_for_range.get(), self._index_var.get(), self._cancel_event), daemon=True).start()
+        self.after(100, self._poll_conversion)
+
+    def _convert_in_background(self, pdf_path, txt_path, range_text, add_to_index, cancel):
+        """Runs the conversion off the Tk thread and reports progress through the event queue."""
+        search_index = None
         try:
-            with open(self._pdf_file_path, "rb") as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                extracted_text = "".join(page.extract_text() for page in pdf_reader.pages)
+            search_index = SearchIndex() if add_to_index else None
+            convert_pdf(pdf_path, txt_path, progress=lambda done, total: self._events.put(("progress", done, total)), cancel=cancel, cache=self._cache, page_range=range_text.strip() or None, search_index=search_index)
+            self._events.put(("done", txt_path, None))
+        except ConversionCancelled:
+            self._events.put(("cancelled", None, None))
+        except Exception as e:
+            self._events.put(("error", e, None))
+        finally:
+            if search_index is not None:
+                search_index.close()
 
-            txt_file = filedialog.asksaveasfile(defaultextension=".txt", filetypes=[("Text file", "*.txt"), ("Microsoft Word", "*.doc"), ("OpenDocument", "*.odt"), ("All files", ".*")])
+    def _poll_conversion(self):
+        """Updates the progress bar from the background conversion and reports its outcome."""
+        while True:
+            try:
+                event, first, second = self._events.get_nowait()
+            except queue.Empty:
+                self.after(100, self._poll_conversion)
+                return
+            if event == "progress":
+                self._progress_bar.config(maximum=second, value=first)
+                self._progress_label.config(text=f"Page {first} of {second}")
+                continue
 
-            if txt_file:
-                with open(txt_file.name, "w", encoding="utf-8") as f:
-                    f.write(extracted_text)
-                messagebox.showinfo("Success!", f"The PDF has been converted to text successfully and saved at:\n{txt_file.name}")
+            self._finish_conversion()
+            if event == "done":
+                messagebox.showinfo("Success!", f"The PDF has been converted to text successfully and saved at:\n{first}")
                 self._reset()
-        except Exception as e:
-            messagebox.showerror("File Error", f"An error occurred while converting the file: {str(e)}")
+            elif event == "error":
+                messagebox.showerror("File Error", f"An error occurred while converting the file: {str(first)}")
+            return
+
+    def _cancel_conversion(self):
+        """Asks the background conversion to stop."""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._progress_label.config(text="Cancelling...")
+
+    def _finish_conversion(self):
+        """Hides the progress widgets and re-enables the buttons."""
+        self._progress_bar.grid_remove()
+        self._progress_label.grid_remove()
+        self._cancel_button.grid_remove()
+        self._change_button.config(state=NORMAL)
+        self._choose_file_button.config(state=NORMAL)
 
     def _reset(self):
-        """Resets the PDF file path and clears the file label."""
+        """Resets the PDF file path, the page range and clears the file label."""
         self._pdf_file_path = None
         self._pdf_file_label.config(text="")
+        self._entry_for_range.delete(0, END)
+
+
+def _synthetic_pages(count, page_size=2000):
+    """Yields `count` pages of generated text."""
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    body = line * (page_size // len(line))
+    for number in range(count):
+        yield f"Page {number + 1}\n{body}"
+
+
+def _measure_memory(mode, count):
+    """Writes synthetic pages in the given mode and returns the peak RSS in MB. Runs in a fresh process."""
+    import resource  # Unix only, so it is imported just for the benchmark.
+    with open(os.devnull, "wb") as output:
+        if mode == "streaming":
+            write_pages(_synthetic_pages(count), output, separator="\f")
+        else:
+            output.write("".join(_synthetic_pages(count)).encode("utf-8"))
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_memory_benchmark(args):
+    """Shows how peak memory grows with the page count for the streaming and the whole-string output."""
+    print(f"{'pages':>9} {'streaming MB':>13} {'joined MB':>10}")
+    for count in args.pages:
+        peaks = []
+        for mode in ("streaming", "joined"):
+            # ru_maxrss is a high-water mark, so every measurement gets its own process.
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                peaks.append(executor.submit(_measure_memory, mode, count).result())
+        print(f"{count:>9} {peaks[0]:>13.1f} {peaks[1]:>10.1f}")
+
+
+def _run_benchmark(args):
+    """Times the extraction of a PDF file with different numbers of worker processes."""
+    print(f"{args.pdf}: {page_count(args.pdf)} pages")
+    for workers in args.workers:
+        start = time.perf_counter()
+        pages = sum(1 for _ in extract_pages(args.pdf, workers))
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>3} worker(s): {elapsed:7.2f} s ({pages / elapsed:.1f} pages/sec)")
+
+
+def _run_range_benchmark(args):
+    """Times the extraction of page ranges of different sizes from the same file."""
+    total = page_count(args.pdf)
+    print(f"{args.pdf}: {total} pages")
+    for range_text in args.ranges:
+        start, stop = parse_page_range(range_text, total)
+        began = time.perf_counter()
+        for _ in extract_pages(args.pdf, workers=1, page_range=(start, stop)):
+            pass
+        elapsed = time.perf_counter() - began
+        print(f"pages {range_text:>10}: {stop - start:>6} pages in {elapsed:7.3f} s ({elapsed / (stop - start) * 1000:.2f} ms/page)")
+
+
+def _run_batch(args):
+    """Converts directories of PDF files from the command line."""
+    search_index = SearchIndex(args.index) if args.index else None
+    converter = BatchConverter(args.output_dir, args.workers, args.force, search_index)
+    report_path = args.report or os.path.join(args.output_dir, "report.jsonl")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    start = time.perf_counter()
+    try:
+        with open(report_path, "a", encoding="utf-8") as report:
+            converter.run(find_pdfs(args.inputs, args.manifest), report)
+    finally:
+        if search_index is not None:
+            search_index.close()
+    counts = converter.counts
+    print(f"Converted: {counts['converted']}, skipped: {counts['skipped']}, errors: {counts['error']} in {time.perf_counter() - start:.1f} s")
+    print(f"Report: {report_path}")
+
+
+def _run_search(args):
+    """Prints the pages that match a query, best first."""
+    search_index = SearchIndex(args.index)
+    try:
+        results = search_index.search(args.query, args.limit)
+    finally:
+        search_index.close()
+    for pdf_path, page, snippet in results:
+        print(f"{pdf_path}:{page}: {' '.join(snippet.split())}")
+    if not results:
+        print("No matches.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert PDF files to text. Without a command the GUI is started.")
+    commands = parser.add_subparsers(dest="command")
+
+    convert = commands.add_parser("convert", help="Convert a PDF file without the GUI.")
+    convert.add_argument("pdf", help="Path to the PDF file.")
+    convert.add_argument("output", help="Path of the text file to write.")
+    convert.add_argument("-w", "--workers", type=int, help="Number of worker processes (defaults to the number of CPUs).")
+    convert.add_argument("-s", "--separator", default="", help='Text written between pages, e.g. "\\f" or "\\n--- Page {page} ---\\n"; {page} is the page number in the document, also with --pages.')
+    convert.add_argument("--offsets", help="File that receives the byte offset of every converted page in the output, one per line.")
+    convert.add_argument("-p", "--pages", default="", help='Pages to convert, e.g. "10-20" (1-based, inclusive; all by default).')
+    convert.add_argument("--no-cache", action="store_true", help="Do not use or fill the extraction cache.")
+    convert.add_argument("--cache-dir", default=EXTRACTION_CACHE_DIR, help="Directory of the extraction cache.")
+    convert.add_argument("--cache-size", type=int, default=1024, help="Maximum size of the extraction cache in MB.")
+    convert.add_argument("--index", nargs="?", const=SEARCH_INDEX_PATH, help="Add the pages to the search index (at the given path or the default one).")
+
+    cache_stats = commands.add_parser("cache-stats", help="Show extraction cache statistics.")
+    cache_stats.add_argument("--cache-dir", default=EXTRACTION_CACHE_DIR, help="Directory of the extraction cache.")
+
+    batch = commands.add_parser("batch", help="Convert many PDF files, skipping the ones that have not changed.")
+    batch.add_argument("inputs", nargs="*", help="Directories (searched recursively) or PDF files.")
+    batch.add_argument("-o", "--output-dir", required=True, help="Directory for the text files; directory trees are mirrored.")
+    batch.add_argument("-m", "--manifest", help="File listing PDF paths, one per line.")
+    batch.add_argument("-w", "--workers", type=int, help="Number of files converted at once (defaults to the number of CPUs).")
+    batch.add_argument("-r", "--report", help="JSONL report to append to (defaults to report.jsonl in the output directory).")
+    batch.add_argument("-f", "--force", action="store_true", help="Convert every file, even if it has not changed.")
+    batch.add_argument("--index", nargs="?", const=SEARCH_INDEX_PATH, help="Add the converted files to the search index (at the given path or the default one).")
+
+    search = commands.add_parser("search", help="Find the converted PDF pages that mention a term.")
+    search.add_argument("query", help='FTS5 query, e.g. invoice, "net amount" or tax AND 2023.')
+    search.add_argument("--index", default=SEARCH_INDEX_PATH, help="Path of the search index.")
+    search.add_argument("-n", "--limit", type=int, default=20, help="Maximum number of pages to show.")
+
+    bench = commands.add_parser("bench", help="Compare extraction times for different numbers of workers.")
+    bench.add_argument("pdf", help="Path to the PDF file, ideally with 500+ pages.")
+    bench.add_argument("-w", "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Worker counts to compare.")
+
+    bench_range = commands.add_parser("bench-range", help="Show that extracting a page range costs in proportion to its size.")
+    bench_range.add_argument("pdf", help="Path to a large PDF file.")
+    bench_range.add_argument("ranges", nargs="+", help='Page ranges to time, e.g. "10-20" "1-200" "1-".')
+
+    bench_memory = commands.add_parser("bench-memory", help="Show peak memory of writing the text as the page count grows.")
+    bench_memory.add_argument("pages", type=int, nargs="*", default=[1000, 10000, 100000], help="Page counts to measure.")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        separator = args.separator.replace("\\n", "\n").replace("\\f", "\f").replace("\\t", "\t")
+        cache = None if args.no_cache else ExtractionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        start = time.perf_counter()
+        search_index = SearchIndex(args.index) if args.index else None
+        try:
+            pages = convert_pdf(args.pdf, args.output, args.workers, separator=separator, offsets_path=args.offsets, cache=cache, page_range=args.pages or None, search_index=search_index)
+        except PageRangeError as e:
+            parser.error(str(e))
+        finally:
+            if search_index is not None:
+                search_index.close()
+        elapsed = time.perf_counter() - start
+        print(f"Converted {pages} pages in {elapsed:.2f} s ({elapsed / max(pages, 1) * 1000:.1f} ms/page)")
+        return
+
+    if args.command == "cache-stats":
+        stats = ExtractionCache(args.cache_dir).stats()
+        print(", ".join(f"{name}: {value}" for name, value in stats.items()))
+        return
+
+    if args.command == "search":
+        if not os.path.exists(args.index):
+            search.error(f"no search index at {args.index}; convert files with --index first")
+        try:
+            _run_search(args)
+        except sqlite3.OperationalError as e:
+            search.error(f"invalid query: {e}")
+        return
+
+    if args.command == "bench-range":
+        _run_range_benchmark(args)
+        return
+
+    if args.command == "bench-memory":
+        _run_memory_benchmark(args)
+        return
+
+    if args.command == "batch":
+        if not args.inputs and not args.manifest:
+            batch.error("give at least one input or a --manifest")
+        _run_batch(args)
+        return
+
+    if args.command == "bench":
+        _run_benchmark(args)
+        return
 
-if __name__ == "__main__":
     root = Tk()
     root.title("PDF to Text Converter")
-    root.geometry("350x175")
+    root.geometry("350x310")
     root.resizable(False, False)
     app = PDFConverterApp(root)
     app.pack(padx=5, pady=5)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
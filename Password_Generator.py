@@ -1,7 +1,16 @@
+import sys
+import json
+import time
 import random
-import string
+import argparse
+import statistics
+import threading
+import http.client
 from tkinter import *
 from tkinter import messagebox
+from tk_debounce import Debouncer
+from password_core import SIMILAR_CHARACTERS, STRENGTH_LABELS, STRENGTH_THRESHOLDS, EntropyPool, PasswordPolicy, make_server, score_file, score_password, write_passwords
+
 
 class PasswordGenerator(Frame):
     """Application class for generating random passwords with various options."""
@@ -18,6 +27,8 @@ class PasswordGenerator(Frame):
         self._no_similar_chars = BooleanVar(value=False)
         self._no_duplicate_chars = BooleanVar(value=False)
         self._no_sequential_chars = BooleanVar(value=False)
+        # Slider drags and checkbox clicks regenerate once per burst, and not at all when the options end up as they were.
+        self._options_changed = Debouncer(self, self._generate_passwords, delay=120, max_wait=300, key=self._options)
         self._create_widgets()
         self._generate_passwords()
 
@@ -26,53 +37,55 @@ class PasswordGenerator(Frame):
         Label(self, text="Generated Password:", font=("Calibri", 14, "bold")).grid(row=0, column=0, columnspan=2, pady=10)
         self._password_display = Entry(self, font=("Calibri", 14), width=35, bd=2, justify="center", state="readonly")
         self._password_display.grid(row=1, column=0, columnspan=2, pady=5)
+        self._strength_label = Label(self, text="", font=("Calibri", 10))
+        self._strength_label.grid(row=2, column=0, columnspan=2)
         
         button_frame = Frame(self)
-        button_frame.grid(row=2, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=10)
         
         Button(button_frame, text="Generate", width=10, command=self._generate_passwords).pack(side=LEFT, padx=10)
         Button(button_frame, text="Copy All", width=10, command=self._copy_password).pack(side=LEFT, padx=10)
         
-        Label(self, text="Password Length:").grid(row=3, column=0, sticky=E, padx=10, pady=5)
-        self._length_scrollbar = Scale(self, from_=6, to=30, orient=HORIZONTAL, variable=self._password_length, command=self._generate_passwords, length=230)
-        self._length_scrollbar.grid(row=3, column=1, sticky=W, padx=10, pady=5)
-
-        Checkbutton(self, text="Include Symbols", variable=self._include_symbols, command=self._generate_passwords).grid(row=4, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="Include Numbers", variable=self._include_numbers, command=self._generate_passwords).grid(row=5, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="Include Lowercase Characters", variable=self._include_lowercase, command=self._generate_passwords).grid(row=6, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="Include Uppercase Characters", variable=self._include_uppercase, command=self._generate_passwords).grid(row=7, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="No Similar Characters", variable=self._no_similar_chars, command=self._generate_passwords).grid(row=8, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="No Duplicate Characters", variable=self._no_duplicate_chars, command=self._generate_passwords).grid(row=9, column=0, columnspan=2, sticky=W, padx=20)
-        Checkbutton(self, text="No Sequential Characters", variable=self._no_sequential_chars, command=self._generate_passwords).grid(row=10, column=0, columnspan=2, sticky=W, padx=20)
+        Label(self, text="Password Length:").grid(row=4, column=0, sticky=E, padx=10, pady=5)
+        self._length_scrollbar = Scale(self, from_=6, to=30, orient=HORIZONTAL, variable=self._password_length, command=self._options_changed, length=230)
+        self._length_scrollbar.grid(row=4, column=1, sticky=W, padx=10, pady=5)
+
+        Checkbutton(self, text="Include Symbols", variable=self._include_symbols, command=self._options_changed).grid(row=5, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="Include Numbers", variable=self._include_numbers, command=self._options_changed).grid(row=6, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="Include Lowercase Characters", variable=self._include_lowercase, command=self._options_changed).grid(row=7, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="Include Uppercase Characters", variable=self._include_uppercase, command=self._options_changed).grid(row=8, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="No Similar Characters", variable=self._no_similar_chars, command=self._options_changed).grid(row=9, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="No Duplicate Characters", variable=self._no_duplicate_chars, command=self._options_changed).grid(row=10, column=0, columnspan=2, sticky=W, padx=20)
+        Checkbutton(self, text="No Sequential Characters", variable=self._no_sequential_chars, command=self._options_changed).grid(row=11, column=0, columnspan=2, sticky=W, padx=20)
 
     def _generate_passwords(self, event=None):
-        """Generates a password based on user options and displays it."""
-        password = self._generate_password()
+        """Generates a password based on user options and displays it with its strength."""
+        try:
+            password = self._generate_password()
+            bits, label = score_password(password)
+            strength = f"Strength: {label} ({bits:.0f} bits of entropy)"
+        except ValueError as e:
+            password = str(e)
+            strength = ""
         self._password_display.config(state=NORMAL)
         self._password_display.delete(0, END)
         self._password_display.insert(0, password)
         self._password_display.config(state="readonly")
+        self._strength_label.config(text=strength)
+
+    def _options(self):
+        """Returns the current values of all options."""
+        return (self._password_length.get(), self._include_lowercase.get(), self._include_uppercase.get(), self._include_numbers.get(), self._include_symbols.get(),
+                self._no_similar_chars.get(), self._no_duplicate_chars.get(), self._no_sequential_chars.get())
+
+    def event_stats(self):
+        """Returns how many option changes were received and how many of them regenerated the password."""
+        return self._options_changed.stats()
 
     def _generate_password(self):
-        """Generates a single password based on user options."""
-        length = self._password_length.get()
-        characters = ''
-        
-        if self._include_lowercase.get():
-            characters += string.ascii_lowercase
-        if self._include_uppercase.get():
-            characters += string.ascii_uppercase
-        if self._include_numbers.get():
-            characters += string.digits
-        if self._include_symbols.get():
-            characters += string.punctuation
-        if self._no_similar_chars.get():
-            characters = characters.translate({ord(i): None for i in 'il1LoO0'})
-        if not characters:
-            return "No character sets selected!"
-
-        password = ''.join(random.choice(characters) for _ in range(length))
-        return password
+        """Generates a single password based on user options; raises ValueError if they cannot be satisfied."""
+        policy = PasswordPolicy(*self._options())
+        return next(policy.generate(1))
 
     def _copy_password(self):
         """Copies the generated password to the clipboard."""
@@ -81,11 +94,205 @@ class PasswordGenerator(Frame):
         self.clipboard_append(password)
         messagebox.showinfo("Copied", "Password has been copied to clipboard.")
 
-if __name__ == "__main__":
+
+def _policy_from_args(args, parser):
+    """Builds the password policy selected by the command line options."""
+    try:
+        return PasswordPolicy(args.length, not args.no_lowercase, not args.no_uppercase, not args.no_numbers, not args.no_symbols,
+                              args.no_similar, args.no_duplicates, args.no_sequential)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def _run_bulk(args, parser):
+    """Streams passwords to a file or to stdout."""
+    policy = _policy_from_args(args, parser)
+    start = time.perf_counter()
+    if args.output:
+        with open(args.output, 'w', encoding='ascii') as output:
+            written = write_passwords(policy.generate(args.count), output)
+        print(f"Wrote {written} passwords to {args.output} in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    else:
+        write_passwords(policy.generate(args.count), sys.stdout)
+
+
+def _run_benchmark(args, parser):
+    """Compares passwords per second of the bulk generator with one random.choice call per character."""
+    policy = _policy_from_args(args, parser)
+    start = time.perf_counter()
+    for _ in range(args.count):
+        ''.join(random.choice(policy.alphabet) for _ in range(args.length))
+    baseline = args.count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in policy.generate(args.count):
+        pass
+    bulk = args.count / (time.perf_counter() - start)
+    print(f"random.choice per character: {baseline:12,.0f} passwords/s")
+    print(f"bulk CSPRNG generator:       {bulk:12,.0f} passwords/s ({bulk / baseline:.1f}x)")
+
+
+def _run_score(args):
+    """Scores every password in a file and prints how many fall into each strength class."""
+    try:
+        import numpy as np
+    except ImportError:
+        sys.exit("Scoring a file requires NumPy (pip install numpy).")
+
+    counts = np.zeros(len(STRENGTH_LABELS), np.int64)
+    total_bits = 0.0
+    start = time.perf_counter()
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for bits in score_file(args.file):
+            labels = np.digitize(bits, STRENGTH_THRESHOLDS)
+            counts += np.bincount(labels, minlength=len(STRENGTH_LABELS))
+            total_bits += bits.sum()
+            if output is not None:
+                output.write(''.join(f"{value:.1f},{STRENGTH_LABELS[label]}\n" for value, label in zip(bits.tolist(), labels.tolist())))
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    scored = int(counts.sum())
+    print(f"Scored {scored} passwords in {elapsed:.2f} s ({scored / max(elapsed, 1e-9):,.0f} passwords/s)")
+    if scored:
+        print(f"Mean entropy: {total_bits / scored:.1f} bits")
+    for label, count in zip(STRENGTH_LABELS, counts.tolist()):
+        print(f"{label:>12}: {count:>10} ({count / max(scored, 1):.1%})")
+
+
+def _run_service(args):
+    """Runs the local password service until it is interrupted."""
+    entropy_pool = EntropyPool(blocks=args.pool_blocks)
+    server = make_server(args.host, args.port, entropy_pool)
+    print(f"Serving passwords on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        entropy_pool.close()
+
+
+def _run_load_test(args):
+    """Sends requests from concurrent keep-alive clients to a running password service and reports the latency."""
+    if args.endpoint == "generate":
+        method, path, body = "GET", f"/generate?count={args.batch}&length={args.length}", None
+    else:
+        passwords = list(PasswordPolicy(args.length).generate(args.batch))
+        method, path, body = "POST", "/score", json.dumps({"passwords": passwords}).encode('utf-8')
+    headers = {"Content-Type": "application/json"} if body else {}
+    latencies = []
+    errors = []
+    per_client = [args.requests // args.concurrency + (index < args.requests % args.concurrency) for index in range(args.concurrency)]
+
+    def client(requests):
+        connection = http.client.HTTPConnection(args.host, args.port, timeout=30)
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                try:
+                    connection.request(method, path, body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    errors.append(str(e))
+                    connection.close()
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if response.status != 200:
+                    errors.append(f"HTTP {response.status}")
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(requests,)) for requests in per_client]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(latencies)} requests to {args.endpoint} ({args.batch} per request) from {args.concurrency} clients in {elapsed:.2f} s: {len(latencies) / elapsed:,.0f} requests/s, {len(errors)} errors")
+    if errors:
+        print(f"First error: {errors[0]}")
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f"Latency p50: {percentiles[49] * 1000:.2f} ms, p90: {percentiles[89] * 1000:.2f} ms, p99: {percentiles[98] * 1000:.2f} ms, max: {max(latencies) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate random passwords. Without a command the GUI is started.")
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("-l", "--length", type=int, default=18, help="Length of every password.")
+    options.add_argument("--no-symbols", action="store_true", help="Leave out symbols.")
+    options.add_argument("--no-numbers", action="store_true", help="Leave out numbers.")
+    options.add_argument("--no-lowercase", action="store_true", help="Leave out lowercase characters.")
+    options.add_argument("--no-uppercase", action="store_true", help="Leave out uppercase characters.")
+    options.add_argument("--no-similar", action="store_true", help=f"Leave out similar characters ({SIMILAR_CHARACTERS}).")
+    options.add_argument("--no-duplicates", action="store_true", help="Use every character at most once.")
+    options.add_argument("--no-sequential", action="store_true", help='Never put neighbouring characters such as "ab" or "98" next to each other.')
+    parser.add_argument("--event-stats", action="store_true", help="When the window is closed, print how many option changes regenerated the password.")
+    commands = parser.add_subparsers(dest="command")
+
+    bulk = commands.add_parser("bulk", parents=[options], help="Generate many passwords with the operating system's CSPRNG.")
+    bulk.add_argument("-n", "--count", type=int, default=1, help="Number of passwords.")
+    bulk.add_argument("-o", "--output", help="File to write the passwords to (stdout by default).")
+
+    bench = commands.add_parser("bench", parents=[options], help="Compare the bulk generator with one random.choice call per character.")
+    bench.add_argument("-n", "--count", type=int, default=100000, help="Number of passwords per run.")
+
+    score = commands.add_parser("score", help="Estimate the strength of every password in a file (needs NumPy).")
+    score.add_argument("file", help="File with one password per line.")
+    score.add_argument("-o", "--output", help="CSV file that receives the entropy and strength of every line, in order.")
+
+    serve = commands.add_parser("serve", help="Run the local password service (generate and score over HTTP).")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    serve.add_argument("--pool-blocks", type=int, default=32, help="Blocks of 64 KB of random bytes kept ready.")
+
+    load_test = commands.add_parser("load-test", help="Measure the latency of a running password service under concurrent load.")
+    load_test.add_argument("--host", default="127.0.0.1", help="Address of the service.")
+    load_test.add_argument("--port", type=int, default=8765, help="Port of the service.")
+    load_test.add_argument("-c", "--concurrency", type=int, default=16, help="Number of concurrent clients.")
+    load_test.add_argument("-n", "--requests", type=int, default=5000, help="Total number of requests.")
+    load_test.add_argument("-e", "--endpoint", choices=("generate", "score"), default="generate", help="Endpoint to call.")
+    load_test.add_argument("-b", "--batch", type=int, default=1, help="Passwords generated or scored per request.")
+    load_test.add_argument("-l", "--length", type=int, default=18, help="Length of the passwords.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        _run_service(args)
+        return
+
+    if args.command == "load-test":
+        _run_load_test(args)
+        return
+
+    if args.command == "score":
+        _run_score(args)
+        return
+
+    if args.command == "bulk":
+        _run_bulk(args, bulk)
+        return
+
+    if args.command == "bench":
+        _run_benchmark(args, bench)
+        return
+
     root = Tk()
     root.title("Password Generator")
-    root.geometry("420x375")
+    root.geometry("420x400")
     root.resizable(False, False)
     app = PasswordGenerator(root)
     app.pack()
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if args.event_stats:
+        print("Option changes: {events}, regenerations: {recomputes}, skipped as unchanged: {unchanged}".format(**app.event_stats()))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
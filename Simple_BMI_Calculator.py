@@ -1,5 +1,11 @@
+import sys
+import time
+import random
+import argparse
 from tkinter import * # type: ignore
 from tkinter import messagebox
+from tk_debounce import Debouncer
+from bmi_core import BMI_THRESHOLDS, bmi_status, calculate_bmi, classify_cohort, parse_number
 
 class BMICalculator(Frame):
     """Main application class for calculating BMI."""
@@ -10,6 +16,12 @@ class BMICalculator(Frame):
         self._bmi = '0.0'
         self._bmi_status = ''
         self.grid(sticky=N+S+E+W)
+        self._height_text = StringVar()
+        self._mass_text = StringVar()
+        # Typing recomputes the BMI once the user pauses, and only when the numbers changed.
+        self._input_changed = Debouncer(self, self._calculate_live, delay=250, key=self._typed_bmi)
+        self._height_text.trace_add('write', self._input_changed)
+        self._mass_text.trace_add('write', self._input_changed)
         self._create_widgets()
     
     def _create_widgets(self):
@@ -29,12 +41,12 @@ class BMICalculator(Frame):
         
         self._height_label = Label(self, text='Your height (cm):', font=('Calibri', 12), pady=5)
         self._height_label.grid(row=2, column=0, sticky=E, padx=(10, 0))
-        self._entry_for_height = Entry(self)
+        self._entry_for_height = Entry(self, textvariable=self._height_text)
         self._entry_for_height.grid(row=2, column=1, padx=5, sticky=W)
         
         self._mass_label = Label(self, text='Your mass (kg):', font=('Calibri', 12), pady=5)
         self._mass_label.grid(row=3, column=0, sticky=E, padx=(10, 0))
-        self._entry_for_mass = Entry(self)
+        self._entry_for_mass = Entry(self, textvariable=self._mass_text)
         self._entry_for_mass.grid(row=3, column=1, padx=5, sticky=W)
         
         self._bmi_label = Label(self, text='Your BMI:', font=('Calibri', 12), pady=2)
@@ -55,38 +67,53 @@ class BMICalculator(Frame):
         
     def _calculate(self):
         """Calculates BMI based on user input and updates the display."""
-        user_height = self._entry_for_height.get().replace(',', '.')
-        user_mass = self._entry_for_mass.get().replace(',', '.')
+        user_height = self._entry_for_height.get()
+        user_mass = self._entry_for_mass.get()
         
         if not user_height or not user_mass:
             messagebox.showerror('Input error!', "You can't leave a blank in any field!")
             return
         
         try:
-            user_height = float(user_height) / 100
-            user_mass = float(user_mass)
-            user_bmi = round(user_mass / user_height ** 2, 2)
-            
-            self._your_bmi['text'] = user_bmi
-            
-            if user_bmi < 16:
-                self._your_bmi_status['text'] = 'Starvation < 16'
-            elif user_bmi < 17:
-                self._your_bmi_status['text'] = 'Emaciation [16,17)'
-            elif user_bmi < 18.5:
-                self._your_bmi_status['text'] = 'Underweight [17,18.5)'
-            elif user_bmi < 25:
-                self._your_bmi_status['text'] = 'Optimum [18.5,25)'
-            elif user_bmi < 30:
-                self._your_bmi_status['text'] = 'Overweight [25,30)'
-            else:
-                self._your_bmi_status['text'] = 'Obesity 30 ≤'
+            user_height = parse_number(user_height)
+            user_mass = parse_number(user_mass)
         except ValueError:
             messagebox.showerror('Input error!', 'Input must be numbers!')
+            return
+
+        try:
+            user_bmi = calculate_bmi(user_height, user_mass)
+        except ValueError as e:
+            messagebox.showerror('Input error!', str(e))
+            return
+
+        self._your_bmi['text'] = user_bmi
+        self._your_bmi_status['text'] = bmi_status(user_bmi)
+
+    def _typed_bmi(self):
+        """Returns the BMI of the typed height and mass, or None while they are incomplete or invalid."""
+        try:
+            return calculate_bmi(parse_number(self._height_text.get()), parse_number(self._mass_text.get()))
+        except ValueError:
+            return None
+
+    def _calculate_live(self):
+        """Shows the BMI of the typed values; unlike the button, it stays quiet about invalid input."""
+        user_bmi = self._typed_bmi()
+        if user_bmi is None:
+            self._your_bmi['text'] = self._bmi
+            self._your_bmi_status['text'] = self._bmi_status
+        else:
+            self._your_bmi['text'] = user_bmi
+            self._your_bmi_status['text'] = bmi_status(user_bmi)
+
+    def event_stats(self):
+        """Returns how many edits were received and how many of them recomputed the BMI."""
+        return self._input_changed.stats()
     
     def _help_me(self):
         """Displays a help message with instructions on how to use the application."""
-        messagebox.showinfo('Help!', "First, enter your height and mass, then click on the 'Calculate!' button to check your BMI!")
+        messagebox.showinfo('Help!', "Enter your height and mass: your BMI is shown as you type, or click on the 'Calculate!' button to check it!")
     
     def _reset(self):
         """Resets the input fields and clears the BMI and status display."""
@@ -95,11 +122,111 @@ class BMICalculator(Frame):
         self._your_bmi['text'] = self._bmi
         self._your_bmi_status['text'] = self._bmi_status
 
-if __name__ == "__main__":
+def _run_batch(args, parser):
+    """Classifies a cohort file from the command line and prints the number of rows per status."""
+    start = time.perf_counter()
+    try:
+        counts = classify_cohort(args.input, args.output, args.height_column, args.mass_column, args.chunk_size, args.delimiter)
+    except ImportError as e:
+        sys.exit(f"Batch mode requires NumPy, and pyarrow for Parquet files ({e}).")
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+    rows = sum(counts.values())
+    print(f"Classified {rows} rows in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    for status, count in counts.items():
+        print(f"{status:>22}: {count}")
+
+
+def _run_single(args, parser):
+    """Prints the BMI and status for one height and mass."""
+    try:
+        bmi = calculate_bmi(parse_number(args.height), parse_number(args.mass))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"BMI: {bmi}, status: {bmi_status(bmi)}")
+
+
+def _classify_with_ladder(bmi):
+    """The chain of comparisons the calculator used before the band table, kept for the benchmark."""
+    if bmi < 16:
+        return 'Starvation < 16'
+    elif bmi < 17:
+        return 'Emaciation [16,17)'
+    elif bmi < 18.5:
+        return 'Underweight [17,18.5)'
+    elif bmi < 25:
+        return 'Optimum [18.5,25)'
+    elif bmi < 30:
+        return 'Overweight [25,30)'
+    return 'Obesity 30 ≤'
+
+
+def _run_benchmark(args):
+    """Times the bisect classifier against the old comparison chain and, if available, np.digitize."""
+    values = [round(random.uniform(12, 45), 2) for _ in range(args.count)]
+    assert all(_classify_with_ladder(value) == bmi_status(value) for value in values[:10000])
+
+    for name, classify in (('if/elif chain', _classify_with_ladder), ('bisect band table', bmi_status)):
+        start = time.perf_counter()
+        for value in values:
+            classify(value)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18}: {elapsed / args.count * 1e9:7.1f} ns per value")
+
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    array = np.array(values)
+    start = time.perf_counter()
+    np.digitize(array, BMI_THRESHOLDS)
+    elapsed = time.perf_counter() - start
+    print(f"{'np.digitize':>18}: {elapsed / args.count * 1e9:7.1f} ns per value")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calculate the BMI. Without a command the GUI is started.')
+    parser.add_argument('--event-stats', action='store_true', help='When the window is closed, print how many edits recomputed the BMI.')
+    commands = parser.add_subparsers(dest='command')
+
+    single = commands.add_parser('calc', help='Print the BMI and status for one height and mass.')
+    single.add_argument('height', help='Height in centimetres (a decimal comma is fine).')
+    single.add_argument('mass', help='Mass in kilograms (a decimal comma is fine).')
+
+    bench = commands.add_parser('bench', help='Time the BMI status classifier.')
+    bench.add_argument('-n', '--count', type=int, default=1000000, help='Number of BMI values to classify.')
+
+    batch = commands.add_parser('batch', help='Compute the BMI and status of every row of a CSV or Parquet file.')
+    batch.add_argument('input', help='CSV or Parquet file with height (cm) and mass (kg) columns.')
+    batch.add_argument('output', help='File to write, in the format of the input, with bmi and status columns added.')
+    batch.add_argument('--height-column', default='height', help='Name of the height column.')
+    batch.add_argument('--mass-column', default='mass', help='Name of the mass column.')
+    batch.add_argument('-d', '--delimiter', help="CSV delimiter (detected from the header by default, ';' or ',').")
+    batch.add_argument('-c', '--chunk-size', type=int, default=200000, help='Rows processed at a time.')
+    args = parser.parse_args()
+
+    if args.command == 'calc':
+        _run_single(args, single)
+        return
+
+    if args.command == 'bench':
+        _run_benchmark(args)
+        return
+
+    if args.command == 'batch':
+        _run_batch(args, batch)
+        return
+
     root = Tk()
     root.title('BMI Calculator')
     root.geometry('300x200')
     root.resizable(False, False)
     calculator = BMICalculator(root)
     calculator.pack(padx=10, pady=10, fill=BOTH, expand=True)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if args.event_stats:
+        print('Edits: {events}, recomputes: {recomputes}, skipped as unchanged: {unchanged}'.format(**calculator.event_stats()))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
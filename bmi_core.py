@@ -0,0 +1,182 @@
+"""
+BMI calculation and classification without a GUI, shared by the BMI Calculator window, its
+command line and the batch mode. NumPy (and pyarrow for Parquet files) is imported only by the
+batch functions, so importing this module stays fast.
+"""
+
+import io
+import csv
+import math
+from bisect import bisect_right
+from itertools import islice
+
+
+# Every band is (upper bound, status): a BMI belongs to the first band whose bound is above it.
+BMI_BANDS = (
+    (16, 'Starvation < 16'),
+    (17, 'Emaciation [16,17)'),
+    (18.5, 'Underweight [17,18.5)'),
+    (25, 'Optimum [18.5,25)'),
+    (30, 'Overweight [25,30)'),
+    (math.inf, 'Obesity 30 ≤'),
+)
+BMI_THRESHOLDS = tuple(bound for bound, _ in BMI_BANDS[:-1])
+BMI_STATUSES = tuple(status for _, status in BMI_BANDS)
+INPUT_ERROR_STATUS = 'Input error'
+
+
+def parse_number(text):
+    """Parses a number typed with a decimal point or a decimal comma; raises ValueError if it is not one."""
+    return float(text.replace(',', '.'))
+
+
+def calculate_bmi(height_cm, mass_kg):
+    """Returns the BMI for a height in centimetres and a mass in kilograms, rounded to two decimals."""
+    if not (height_cm > 0 and mass_kg > 0):
+        raise ValueError('Height and mass must be greater than zero!')
+    return round(mass_kg / (height_cm / 100) ** 2, 2)
+
+
+def bmi_status_index(bmi):
+    """Returns the index of the band a BMI belongs to, found by bisecting the band thresholds."""
+    return bisect_right(BMI_THRESHOLDS, bmi)
+
+
+def bmi_status(bmi):
+    """Returns the status of a BMI, e.g. 'Optimum [18.5,25)'."""
+    return BMI_STATUSES[bmi_status_index(bmi)]
+
+
+def _parse_number_or_nan(text):
+    """Parses a number that may use a decimal comma; returns NaN if it is not one."""
+    try:
+        return parse_number(text)
+    except ValueError:
+        return math.nan
+
+
+def _parse_numbers(np, values):
+    """Parses a column of texts with decimal commas into a float array, with NaN for invalid entries."""
+    values = [value.replace(',', '.') for value in values]
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array([_parse_number_or_nan(value) for value in values], dtype=np.float64)
+
+
+def compute_bmi(np, heights_cm, masses_kg):
+    """
+    Returns the BMI rounded to two decimals and the index into `BMI_STATUSES` of every
+    height/mass pair, like `calculate_bmi` and `bmi_status_index` do for one pair. Pairs that are
+    missing or not positive get NaN and the index len(BMI_STATUSES).
+    """
+    heights = np.asarray(heights_cm, dtype=np.float64) / 100
+    masses = np.asarray(masses_kg, dtype=np.float64)
+    valid = (heights > 0) & (masses > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        raw = np.where(valid, masses / heights ** 2, np.nan)
+        bmi = np.round(raw, 2)
+        # np.round scales by 100 first, which can tip values near a half cent the other way than round() does.
+        cents = raw * 100
+        for index in np.flatnonzero(np.abs(cents - np.floor(cents) - 0.5) < 1e-6).tolist():
+            bmi[index] = round(float(raw[index]), 2)
+    statuses = np.where(valid, np.digitize(bmi, BMI_THRESHOLDS), len(BMI_STATUSES))
+    return bmi, statuses
+
+
+def _bmi_chunks_from_csv(np, input_path, output_path, height_column, mass_column, chunk_size, delimiter):
+    """
+    Reads a CSV file chunk by chunk, writes every row with its BMI and status and yields the status indices.
+
+    The two columns of a chunk are parsed by `np.loadtxt` (after turning decimal commas into points
+    when the delimiter is not a comma); chunks with missing or invalid values fall back to the csv
+    module. Input lines are copied as they are with the new fields appended, unless a chunk has
+    quoted fields that span lines, in which case its rows are written again by the csv module.
+    """
+    with open(input_path, 'r', encoding='utf-8-sig', newline='') as source, open(output_path, 'w', encoding='utf-8', newline='') as target:
+        header_line = source.readline()
+        if delimiter is None:
+            delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+        header = next(csv.reader([header_line], delimiter=delimiter))
+        try:
+            height_index, mass_index = header.index(height_column), header.index(mass_column)
+        except ValueError:
+            raise ValueError(f"The input needs the columns '{height_column}' and '{mass_column}'; it has: {', '.join(header)}.") from None
+        writer = csv.writer(target, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(header + ['bmi', 'status'])
+        statuses_text = BMI_STATUSES + (INPUT_ERROR_STATUS,)
+        quoted_statuses = [f'"{status}"' if delimiter in status else status for status in statuses_text]
+
+        while lines := list(islice(source, chunk_size)):
+            rows = None
+            try:
+                text = ''.join(lines)
+                if delimiter != ',':
+                    text = text.replace(',', '.')
+                pairs = np.loadtxt(io.StringIO(text), delimiter=delimiter, usecols=(height_index, mass_index), quotechar='"', comments=None, ndmin=2)
+                if len(pairs) != len(lines):
+                    raise ValueError('The chunk has empty lines or fields that span lines.')
+                heights, masses = pairs[:, 0], pairs[:, 1]
+            except ValueError:
+                rows = list(csv.reader(lines, delimiter=delimiter))
+                heights = _parse_numbers(np, [row[height_index] if len(row) > height_index else '' for row in rows])
+                masses = _parse_numbers(np, [row[mass_index] if len(row) > mass_index else '' for row in rows])
+            bmi, statuses = compute_bmi(np, heights, masses)
+            bmi_text = ['' if value != value else repr(value) for value in bmi.tolist()]
+            if rows is None or len(rows) == len(lines):
+                target.writelines(f"{line.rstrip(chr(13) + chr(10))}{delimiter}{value}{delimiter}{quoted_statuses[status]}\n"
+                                  for line, value, status in zip(lines, bmi_text, statuses.tolist()))
+            else:
+                writer.writerows(row + [value, statuses_text[status]] for row, value, status in zip(rows, bmi_text, statuses.tolist()))
+            yield statuses
+
+
+def _bmi_chunks_from_parquet(np, input_path, output_path, height_column, mass_column, chunk_size):
+    """Reads a Parquet file batch by batch, writes every batch with BMI and status columns and yields the status indices."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    source = pq.ParquetFile(input_path)
+    names = source.schema_arrow.names
+    if height_column not in names or mass_column not in names:
+        raise ValueError(f"The input needs the columns '{height_column}' and '{mass_column}'; it has: {', '.join(names)}.")
+    statuses_text = np.array(BMI_STATUSES + (INPUT_ERROR_STATUS,), dtype=object)
+    writer = None
+    try:
+        for batch in source.iter_batches(batch_size=chunk_size):
+            columns = []
+            for name in (height_column, mass_column):
+                column = batch.column(name)
+                if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+                    columns.append(column.to_numpy(zero_copy_only=False).astype(np.float64))
+                else:
+                    columns.append(_parse_numbers(np, ['' if value is None else str(value) for value in column.to_pylist()]))
+            bmi, statuses = compute_bmi(np, *columns)
+            table = pa.Table.from_batches([batch]).append_column('bmi', pa.array(bmi, from_pandas=True)).append_column('status', pa.array(statuses_text[statuses]))
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+            yield statuses
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def classify_cohort(input_path, output_path, height_column='height', mass_column='mass', chunk_size=200000, delimiter=None):
+    """
+    Computes the BMI and status of every row of a CSV or Parquet cohort file and writes them, in
+    the input's format, next to the original columns. Heights are in centimetres and masses in
+    kilograms; decimal commas are accepted like in the calculator. Rows are processed `chunk_size`
+    at a time, so memory use does not grow with the file. Returns the number of rows per status,
+    with invalid rows under INPUT_ERROR_STATUS. Requires NumPy (and pyarrow for Parquet).
+    """
+    import numpy as np
+
+    if input_path.lower().endswith('.parquet'):
+        chunks = _bmi_chunks_from_parquet(np, input_path, output_path, height_column, mass_column, chunk_size)
+    else:
+        chunks = _bmi_chunks_from_csv(np, input_path, output_path, height_column, mass_column, chunk_size, delimiter)
+    counts = np.zeros(len(BMI_STATUSES) + 1, np.int64)
+    for statuses in chunks:
+        counts += np.bincount(statuses, minlength=len(counts))
+    return dict(zip(BMI_STATUSES + (INPUT_ERROR_STATUS,), counts.tolist()))
@@ -0,0 +1,542 @@
+"""
+Headless password generation and strength scoring, shared by the Password Generator GUI, its
+command line and the local password service.
+"""
+
+import json
+import math
+import queue
+import string
+import secrets
+import threading
+from bisect import insort
+from itertools import permutations
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+SIMILAR_CHARACTERS = 'il1LoO0'
+
+
+def character_classes(lowercase=True, uppercase=True, numbers=True, symbols=True, no_similar=False):
+    """Returns the selected character classes, each as a string of its characters."""
+    classes = []
+    if lowercase:
+        classes.append(string.ascii_lowercase)
+    if uppercase:
+        classes.append(string.ascii_uppercase)
+    if numbers:
+        classes.append(string.digits)
+    if symbols:
+        classes.append(string.punctuation)
+    if no_similar:
+        classes = [characters.translate({ord(i): None for i in SIMILAR_CHARACTERS}) for characters in classes]
+    return tuple(classes)
+
+
+def _options_key(lowercase, uppercase, numbers, symbols, no_similar):
+    """Packs the options that select characters into a 5-bit index into `_ALPHABETS`."""
+    return bool(lowercase) | bool(uppercase) << 1 | bool(numbers) << 2 | bool(symbols) << 3 | bool(no_similar) << 4
+
+
+def build_alphabet(lowercase=True, uppercase=True, numbers=True, symbols=True, no_similar=False):
+    """Returns the characters a password with the given options may be made of."""
+    return _ALPHABETS[_options_key(lowercase, uppercase, numbers, symbols, no_similar)][1]
+
+
+def _sampling_table(alphabet):
+    """
+    Returns a `bytes.translate` table that maps random bytes onto the alphabet and the bytes to delete.
+    Only the largest multiple of len(alphabet) byte values is kept, so every character is equally likely.
+    """
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[value % len(alphabet)]) for value in range(limit)) + bytes(256 - limit)
+    return table, bytes(range(limit, 256))
+
+
+def _precompute_alphabets():
+    """
+    Returns (classes, alphabet, sampling table, class index of every character) for each of the
+    32 combinations of character options, indexed by `_options_key`.
+    """
+    combinations = []
+    for key in range(1 << 5):
+        classes = character_classes(*(bool(key & 1 << bit) for bit in range(5)))
+        alphabet = ''.join(classes)
+        class_of = {character: index for index, characters in enumerate(classes) for character in characters}
+        combinations.append((classes, alphabet, _sampling_table(alphabet) if alphabet else None, class_of))
+    return tuple(combinations)
+
+
+_ALPHABETS = _precompute_alphabets()
+_SAMPLING_TABLES = {alphabet: table for _, alphabet, table, _ in _ALPHABETS if alphabet}
+
+
+def generate_passwords(count, length, alphabet, randbytes=secrets.token_bytes):
+    """
+    Yields `count` passwords of `length` characters drawn uniformly from an ASCII alphabet.
+
+    Random bytes come from the operating system's CSPRNG in blocks of about a megabyte; bytes
+    above the largest multiple of the alphabet size are rejected and the rest are mapped onto the
+    alphabet with one `bytes.translate` call per block, so no Python code runs per character.
+    """
+    table, rejected = _SAMPLING_TABLES.get(alphabet) or _sampling_table(alphabet)
+    acceptance = (256 - len(rejected)) / 256
+    per_block = max(1, (1024 * 1024) // length)
+    pending = b''
+    while count > 0:
+        batch = min(count, per_block)
+        wanted = batch * length
+        while len(pending) < wanted:
+            pending += randbytes(int((wanted - len(pending)) / acceptance) + 64).translate(table, rejected)
+        text = pending[:wanted].decode('ascii')
+        pending = pending[wanted:]
+        for start in range(0, wanted, length):
+            yield text[start:start + length]
+        count -= batch
+
+
+class RandomSource:
+    """
+    Draws uniform random integers from buffered CSPRNG bytes, so a draw needs no system call.
+    The buffer starts small and doubles with every refill up to `buffer_size` bytes, so a source
+    that is used for a single password does not pay for a large read.
+    """
+
+    def __init__(self, randbytes=secrets.token_bytes, buffer_size=64 * 1024):
+        """Prepares an empty buffer."""
+        self._randbytes = randbytes
+        self._next_size = 64
+        self._buffer_size = buffer_size
+        self._values = memoryview(b'').cast('Q')
+        self._position = 0
+
+    def below(self, n):
+        """Returns a uniform integer in [0, n), rejecting the 64-bit draws that would bias it."""
+        if n > 1 << 64:
+            return secrets.randbelow(n)
+        limit = (1 << 64) - (1 << 64) % n
+        while True:
+            if self._position == len(self._values):
+                self._values = memoryview(self._randbytes(self._next_size)).cast('Q')
+                self._next_size = min(self._next_size * 2, self._buffer_size)
+                self._position = 0
+            value = self._values[self._position]
+            self._position += 1
+            if value < limit:
+                return value % n
+
+    def sample(self, n, k):
+        """Returns `k` distinct integers from [0, n) in random order (a partial Fisher-Yates shuffle)."""
+        swapped = {}
+        result = []
+        for i in range(k):
+            j = i + self.below(n - i)
+            result.append(swapped.get(j, j))
+            swapped[j] = swapped.get(i, i)
+        return result
+
+
+class PasswordPolicy:
+    """
+    The options of a password and a generator of passwords that honour all of them.
+
+    Every password has at least one character of each selected class, placed at random positions.
+    With `no_duplicates` no character appears twice and with `no_sequential` no two neighbouring
+    characters are next to each other in the character table (like "ab", "98" or "+,").
+    Passwords are built valid rather than generated and checked, so the cost per character does
+    not depend on how tight the options are. Impossible combinations raise ValueError here.
+    """
+
+    def __init__(self, length=18, lowercase=True, uppercase=True, numbers=True, symbols=True, no_similar=False, no_duplicates=False, no_sequential=False):
+        """Selects the character classes and checks that the options can be satisfied."""
+        self.length = length
+        self.classes, self.alphabet, _, self._class_of = _ALPHABETS[_options_key(lowercase, uppercase, numbers, symbols, no_similar)]
+        self.no_duplicates = no_duplicates
+        self.no_sequential = no_sequential
+        if not self.classes:
+            raise ValueError("No character sets selected!")
+        if length < len(self.classes):
+            raise ValueError(f"A password of {length} characters cannot include all {len(self.classes)} selected character sets.")
+        if no_duplicates and length > len(self.alphabet):
+            raise ValueError(f"Only {len(self.alphabet)} characters are selected, too few for {length} characters without duplicates.")
+        self._choices = {}
+        self._placements = 1
+        for index, characters in enumerate(self.classes):
+            self._placements *= (length - index) * len(characters)
+
+    def generate(self, count, randbytes=secrets.token_bytes):
+        """Yields `count` passwords."""
+        source = RandomSource(randbytes)
+        if not self.no_duplicates and not self.no_sequential:
+            for password in generate_passwords(count, self.length, self.alphabet, randbytes):
+                yield self._place_classes(password, source)
+            return
+        for _ in range(count):
+            yield self._build(source)
+
+    def _place_classes(self, password, source):
+        """
+        Puts one character of every class at distinct random positions of an otherwise uniform password.
+        All positions and characters are decoded from a single draw, one mixed-radix digit per class.
+        """
+        draw = source.below(self._placements)
+        characters = list(password)
+        taken = []
+        for index, characters_of_class in enumerate(self.classes):
+            draw, digit = divmod(draw, (self.length - index) * len(characters_of_class))
+            position, choice = divmod(digit, len(characters_of_class))
+            for taken_position in taken:
+                if position >= taken_position:
+                    position += 1
+            characters[position] = characters_of_class[choice]
+            insort(taken, position)
+        return ''.join(characters)
+
+    def _allowed(self, pool, previous):
+        """Returns the characters of a class (or of the whole alphabet for None) that may follow `previous`."""
+        key = (pool, previous)
+        if key not in self._choices:
+            characters = self.alphabet if pool is None else self.classes[pool]
+            if self.no_sequential and previous is not None:
+                characters = ''.join(character for character in characters if abs(ord(character) - ord(previous)) != 1)
+            self._choices[key] = characters
+        return self._choices[key]
+
+    def _build(self, source):
+        """Builds one password character by character, drawing only from the characters that keep it valid."""
+        required = {position: index for index, position in enumerate(source.sample(self.length, len(self.classes)))}
+        unmet = set(range(len(self.classes)))
+        remaining = list(self.alphabet)
+        slots = {character: slot for slot, character in enumerate(remaining)}
+        characters = []
+        previous = None
+        for position in range(self.length):
+            if self.no_duplicates and self.no_sequential and len(remaining) <= 6:
+                characters.extend(self._finish(source, remaining, previous, self.length - position))
+                break
+            pool = required.get(position)
+            if pool in unmet or not self.no_duplicates:
+                allowed = self._allowed(pool if pool in unmet else None, previous)
+                character = allowed[source.below(len(allowed))]
+            else:
+                skipped = sorted(slots[neighbour] for neighbour in _neighbours(previous) if neighbour in slots) if self.no_sequential else []
+                slot = source.below(len(remaining) - len(skipped))
+                for skipped_slot in skipped:
+                    if slot >= skipped_slot:
+                        slot += 1
+                character = remaining[slot]
+            if self.no_duplicates:
+                slot = slots.pop(character)
+                last = remaining.pop()
+                if slot < len(remaining):
+                    remaining[slot] = last
+                    slots[last] = slot
+            characters.append(character)
+            unmet.discard(self._class_of[character])
+            previous = character
+        return ''.join(characters)
+
+    def _finish(self, source, remaining, previous, count):
+        """
+        Picks the last `count` characters uniformly among all valid orderings of the few remaining ones.
+        Any four or more distinct characters have such an ordering, so there is always one here.
+        """
+        start = (previous,) if previous is not None else ()
+        endings = [ending for ending in permutations(remaining, count) if not _has_sequence(start + ending)]
+        return endings[source.below(len(endings))]
+
+
+def _has_sequence(characters):
+    """Tells whether any two neighbouring characters are next to each other in the character table."""
+    return any(abs(ord(first) - ord(second)) == 1 for first, second in zip(characters, characters[1:]))
+
+
+def _neighbours(character):
+    """Returns the characters next to `character` in the character table."""
+    if character is None:
+        return ()
+    return chr(ord(character) - 1), chr(ord(character) + 1)
+
+
+def write_passwords(passwords, output, batch_size=10000):
+    """Writes passwords to a text stream one per line, `batch_size` at a time, and returns their number."""
+    written = 0
+    batch = []
+    for password in passwords:
+        batch.append(password)
+        if len(batch) == batch_size:
+            output.write('\n'.join(batch) + '\n')
+            written += len(batch)
+            batch.clear()
+    if batch:
+        output.write('\n'.join(batch) + '\n')
+        written += len(batch)
+    return written
+
+
+STRENGTH_THRESHOLDS = (28, 36, 60, 128)
+STRENGTH_LABELS = ("Very weak", "Weak", "Reasonable", "Strong", "Very strong")
+_CLASS_SIZES = (26, 26, 10, 32)
+
+
+def _byte_class(byte):
+    """Returns the class of a byte: 0 lowercase, 1 uppercase, 2 digit, 3 anything else."""
+    if 97 <= byte <= 122:
+        return 0
+    if 65 <= byte <= 90:
+        return 1
+    if 48 <= byte <= 57:
+        return 2
+    return 3
+
+
+def strength_label(bits):
+    """Returns the strength label for an entropy in bits."""
+    return STRENGTH_LABELS[sum(bits >= threshold for threshold in STRENGTH_THRESHOLDS)]
+
+
+def score_password(password):
+    """
+    Estimates the entropy of a password in bits and returns it with its strength label.
+
+    Every UTF-8 byte adds log2 of the combined size of the classes the password uses, except for
+    bytes that repeat or continue the previous one ("aa", "ab", "98"), which add a single bit.
+    """
+    data = password.encode('utf-8')
+    present = set()
+    patterned = 0
+    for index, byte in enumerate(data):
+        present.add(_byte_class(byte))
+        if index and abs(byte - data[index - 1]) <= 1:
+            patterned += 1
+    pool = sum(_CLASS_SIZES[index] for index in present)
+    bits = (len(data) - patterned) * math.log2(pool) + patterned if pool else 0.0
+    return bits, strength_label(bits)
+
+
+def _score_lines(np, data):
+    """Scores every line of a bytes object that ends with a newline, like `score_password` but vectorized."""
+    values = np.frombuffer(data, np.uint8)
+    ends = np.flatnonzero(values == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    counted = values != 10
+    counted[ends[values[ends - 1] == 13] - 1] = False
+    lengths = np.add.reduceat(counted, starts, dtype=np.int64)
+
+    lowercase = (values >= 97) & (values <= 122)
+    uppercase = (values >= 65) & (values <= 90)
+    digits = (values >= 48) & (values <= 57)
+    others = counted & ~(lowercase | uppercase | digits)
+    pool = np.zeros(len(starts), np.int64)
+    for mask, size in zip((lowercase, uppercase, digits, others), _CLASS_SIZES):
+        pool += (np.add.reduceat(mask, starts, dtype=np.int64) > 0) * size
+
+    patterned = np.zeros(len(values), bool)
+    patterned[1:] = np.abs(values[1:].astype(np.int16) - values[:-1]) <= 1
+    patterned &= counted
+    patterned[starts] = False
+    patterned = np.add.reduceat(patterned, starts, dtype=np.int64)
+
+    return np.where(pool > 0, (lengths - patterned) * np.log2(np.maximum(pool, 1)) + patterned, 0.0)
+
+
+def score_file(path, chunk_size=4 * 1024 * 1024):
+    """
+    Yields an array with the entropy of every password in a file (one per line), chunk by chunk.
+    Requires NumPy; character classes and patterns are counted for a whole chunk at once.
+    """
+    import numpy as np
+
+    with open(path, 'rb') as f:
+        rest = b''
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b'\n') + 1
+            rest = data[cut:]
+            if cut:
+                yield _score_lines(np, data[:cut])
+        if rest:
+            yield _score_lines(np, rest + b'\n')
+
+
+class EntropyPool:
+    """
+    Keeps blocks of CSPRNG bytes ready in memory, refilled by a background thread, so requests
+    take their random bytes from memory instead of waiting for the operating system.
+
+    `randbytes` has the signature of `secrets.token_bytes` and can be passed wherever that is
+    accepted. It is thread-safe and never hands out the same bytes twice; when the pool runs dry
+    it falls back to reading the operating system directly and counts a miss.
+    """
+
+    def __init__(self, block_size=64 * 1024, blocks=32):
+        """Starts the thread that fills up to `blocks` blocks of `block_size` bytes."""
+        self._block_size = block_size
+        self._blocks = queue.Queue(maxsize=blocks)
+        self._lock = threading.Lock()
+        self._current = b''
+        self._position = 0
+        self._stop = threading.Event()
+        self._counters = {"blocks": 0, "misses": 0}
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        """Keeps the queue of blocks full until the pool is closed."""
+        while not self._stop.is_set():
+            block = secrets.token_bytes(self._block_size)
+            while not self._stop.is_set():
+                try:
+                    self._blocks.put(block, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def randbytes(self, n):
+        """Returns `n` random bytes."""
+        if n > self._block_size:
+            return secrets.token_bytes(n)
+        with self._lock:
+            if self._position + n > len(self._current):
+                try:
+                    self._current = self._blocks.get_nowait()
+                    self._counters["blocks"] += 1
+                except queue.Empty:
+                    self._current = secrets.token_bytes(self._block_size)
+                    self._counters["misses"] += 1
+                self._position = 0
+            data = self._current[self._position:self._position + n]
+            self._position += n
+            return data
+
+    def stats(self):
+        """Returns how many blocks were taken from the pool, how many had to be read on demand and how many are ready."""
+        with self._lock:
+            return {**self._counters, "ready": self._blocks.qsize()}
+
+    def close(self):
+        """Stops the background thread."""
+        self._stop.set()
+        self._thread.join()
+
+
+MAX_BATCH = 10000
+MAX_LENGTH = 1024
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+_FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def _flag(query, name, default):
+    """Reads a boolean option from a parsed query string."""
+    value = query.get(name)
+    if value is None:
+        return default
+    if value.lower() in _TRUE_VALUES:
+        return True
+    if value.lower() in _FALSE_VALUES:
+        return False
+    raise ValueError(f"{name} must be one of {', '.join(_TRUE_VALUES + _FALSE_VALUES)}.")
+
+
+class _PolicyCache(dict):
+    """Keeps a PasswordPolicy per combination of options, so their caches are shared by requests."""
+
+    MAX_POLICIES = 1024
+
+    def __missing__(self, options):
+        """Creates the policy for options that were not requested before; starts over when full."""
+        if len(self) >= self.MAX_POLICIES:
+            self.clear()
+        policy = self[options] = PasswordPolicy(*options)
+        return policy
+
+
+class PasswordRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the password service as JSON over HTTP/1.1 with keep-alive:
+
+      GET  /generate?length=18&count=1&symbols=1&numbers=1&lowercase=1&uppercase=1&no_similar=0&no_duplicates=0&no_sequential=0
+      POST /score    {"passwords": ["...", ...]}
+      GET  /stats
+
+    A request may ask for, or score, up to `MAX_BATCH` passwords at once. Requests are not logged,
+    since scored passwords travel in them.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Generates passwords or reports the entropy pool statistics."""
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._reply(200, self.server.entropy_pool.stats())
+            return
+        if url.path != '/generate':
+            self._reply(404, {"error": f"Unknown path {url.path}."})
+            return
+
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            count = int(query.get('count', 1))
+            length = int(query.get('length', 18))
+            if not 1 <= count <= MAX_BATCH:
+                raise ValueError(f"count must be between 1 and {MAX_BATCH}.")
+            if not 1 <= length <= MAX_LENGTH:
+                raise ValueError(f"length must be between 1 and {MAX_LENGTH}.")
+            options = (length, _flag(query, 'lowercase', True), _flag(query, 'uppercase', True), _flag(query, 'numbers', True), _flag(query, 'symbols', True),
+                       _flag(query, 'no_similar', False), _flag(query, 'no_duplicates', False), _flag(query, 'no_sequential', False))
+            policy = self.server.policies[options]
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        self._reply(200, {"passwords": list(policy.generate(count, self.server.entropy_pool.randbytes))})
+
+    def do_POST(self):
+        """Scores a batch of passwords."""
+        if self.path != '/score':
+            self._reply(404, {"error": f"Unknown path {self.path}."})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            passwords = body["passwords"]
+            if not isinstance(passwords, list) or not all(isinstance(password, str) for password in passwords):
+                raise ValueError("passwords must be a list of strings.")
+            if len(passwords) > MAX_BATCH:
+                raise ValueError(f"At most {MAX_BATCH} passwords can be scored at once.")
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": f"Invalid request: {e}"})
+            return
+        scores = [score_password(password) for password in passwords]
+        self._reply(200, {"scores": [{"entropy": round(bits, 2), "strength": label} for bits, label in scores]})
+
+    def _reply(self, status, body):
+        """Sends a JSON response."""
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """Keeps requests out of the log."""
+
+
+class _PasswordServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog for many clients connecting at once."""
+
+    request_queue_size = 128
+
+
+def make_server(host='127.0.0.1', port=8765, entropy_pool=None):
+    """Returns a threaded HTTP server for the password service; call `serve_forever` to run it."""
+    server = _PasswordServer((host, port), PasswordRequestHandler)
+    server.entropy_pool = entropy_pool or EntropyPool()
+    server.policies = _PolicyCache()
+    return server
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bmi_core  # noqa: E402
+
+
+def test_parquet_cohort_gets_bmi_and_status_columns(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    input_path = str(tmp_path / 'cohort.parquet')
+    output_path = str(tmp_path / 'classified.parquet')
+    pq.write_table(pa.table({'id': [1, 2, 3, 4], 'height': [180.0, 160.0, 0.0, 170.0], 'mass': ['81', '40,5', '70', None]}), input_path)
+
+    counts = bmi_core.classify_cohort(input_path, output_path, chunk_size=3)
+
+    result = pq.read_table(output_path).to_pydict()
+    assert result['id'] == [1, 2, 3, 4]
+    assert result['bmi'][:2] == [bmi_core.calculate_bmi(180, 81), bmi_core.calculate_bmi(160, 40.5)]
+    assert result['status'] == [bmi_core.bmi_status(25.0), bmi_core.bmi_status(15.82), bmi_core.INPUT_ERROR_STATUS, bmi_core.INPUT_ERROR_STATUS]
+    assert counts[bmi_core.INPUT_ERROR_STATUS] == 2 and sum(counts.values()) == 4
+
+
+def test_parquet_cohort_without_the_mass_column_is_rejected(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    input_path = str(tmp_path / 'cohort.parquet')
+    pq.write_table(pa.table({'height': [180.0], 'weight': [81.0]}), input_path)
+
+    with pytest.raises(ValueError, match="'mass'"):
+        bmi_core.classify_cohort(input_path, str(tmp_path / 'classified.parquet'))
+
+
+def test_vectorized_statuses_match_bmi_status_index():
+    np = pytest.importorskip('numpy')
+    bmi_values = [15.99, 16, 16.5, 17, 18.49, 18.5, 24.99, 25, 29.99, 30, 42]
+
+    _, statuses = bmi_core.compute_bmi(np, [100] * len(bmi_values), bmi_values)
+
+    assert statuses.tolist() == [bmi_core.bmi_status_index(bmi) for bmi in bmi_values]
+    assert [bmi_core.bmi_status(bmi) for bmi in bmi_values] == [bmi_core.BMI_STATUSES[index] for index in statuses.tolist()]
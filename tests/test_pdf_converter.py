@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import PDF_Converter  # noqa: E402
+
+
+def _write_pdf(path, page_count):
+    """Writes a minimal PDF whose page n shows the text "Text n"."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, page_count + 1):
+        stream = f"BT /F1 12 Tf 72 720 Td (Text {number}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_ranged_conversion_numbers_separators_from_the_document(tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    txt_path = str(tmp_path / "doc.txt")
+    _write_pdf(pdf_path, 12)
+
+    pages = PDF_Converter.convert_pdf(pdf_path, txt_path, workers=1, separator="\n--- Page {page} ---\n", page_range="10-12")
+
+    with open(txt_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert pages == 3
+    assert text.index("Text 10") < text.index("--- Page 11 ---") < text.index("Text 11") < text.index("--- Page 12 ---") < text.index("Text 12")
+    assert "--- Page 2 ---" not in text
+
+
+def test_ranged_conversion_from_the_cache_numbers_separators_the_same_way(tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    _write_pdf(pdf_path, 5)
+    cache = PDF_Converter.ExtractionCache(str(tmp_path / "cache"))
+    PDF_Converter.convert_pdf(pdf_path, str(tmp_path / "all.txt"), workers=1, cache=cache)
+
+    txt_path = str(tmp_path / "range.txt")
+    PDF_Converter.convert_pdf(pdf_path, txt_path, workers=1, separator="|{page}|", cache=cache, page_range=(2, 4))
+
+    with open(txt_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert cache.stats()["hits"] == 1
+    assert text.startswith("Text 3") and "|4|Text 4" in text
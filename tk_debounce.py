@@ -0,0 +1,63 @@
+"""
+Coalescing of bursts of Tk events (slider drags, key presses) into single recomputes, shared by
+the Password Generator and the BMI Calculator.
+"""
+
+import time
+
+
+class Debouncer:
+    """
+    Calls `callback` once, `delay` ms after the last of a burst of events, using the Tk event loop.
+
+    An instance is used directly as a Tk `command` or variable trace. If events keep coming, the
+    callback still runs at least every `max_wait` ms (when given), so a long slider drag shows
+    intermediate results. With a `key` function, a recompute whose key equals the one of the last
+    recompute is skipped, e.g. when a slider is dragged away and back. The counters tell how many
+    events were received and how many of them led to a recompute.
+    """
+
+    def __init__(self, widget, callback, delay=150, max_wait=None, key=None):
+        """Binds the debouncer to the widget whose `after` timers it uses."""
+        self._widget = widget
+        self._callback = callback
+        self._delay = delay
+        self._max_wait = max_wait
+        self._key = key
+        self._last_key = None
+        self._pending = None
+        self._burst_start = None
+        self.events = 0
+        self.recomputes = 0
+        self.unchanged = 0
+
+    def __call__(self, *_):
+        """Records an event and (re)schedules the recompute."""
+        self.events += 1
+        now = time.monotonic()
+        if self._burst_start is None:
+            self._burst_start = now
+        if self._pending is not None:
+            self._widget.after_cancel(self._pending)
+            self._pending = None
+        if self._max_wait is not None and (now - self._burst_start) * 1000 >= self._max_wait:
+            self._fire()
+        else:
+            self._pending = self._widget.after(self._delay, self._fire)
+
+    def _fire(self):
+        """Runs the callback for the events received so far, unless their key did not change."""
+        self._pending = None
+        self._burst_start = None
+        if self._key is not None:
+            key = self._key()
+            if key == self._last_key:
+                self.unchanged += 1
+                return
+            self._last_key = key
+        self.recomputes += 1
+        self._callback()
+
+    def stats(self):
+        """Returns the number of events, recomputes and recomputes skipped because nothing changed."""
+        return {"events": self.events, "recomputes": self.recomputes, "unchanged": self.unchanged}
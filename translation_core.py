@@ -0,0 +1,503 @@
+"""
+Translation of long texts without a GUI, shared by the Text Translator window and its command
+line. A text is split into paragraph segments, every distinct segment is translated once, and the
+segments are sent in batched requests within DeepL's size limits that run concurrently. Segments
+translated before are taken from an SQLite translation memory instead. Large files are streamed
+through in chunks, with a checkpoint that lets an interrupted job resume, and a text that is being
+edited is re-translated paragraph by paragraph. Any object with DeepL's `translate_text` method
+can do the translating, e.g. `FakeTranslator` for testing.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+from itertools import accumulate
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# DeepL accepts at most 50 texts and 128 KiB per request; the byte limit keeps room for the other parameters.
+MAX_REQUEST_TEXTS = 50
+MAX_REQUEST_BYTES = 120 * 1024
+MAX_SEGMENT_CHARS = 5000
+MIN_CHUNK_BYTES = 4 * 1024
+TRANSLATION_MEMORY_PATH = os.path.join(os.path.expanduser('~'), '.translator_memory.sqlite3')
+
+# Paragraphs end at blank lines; single line breaks belong to the paragraph, as in hard-wrapped text.
+_PARAGRAPH_BREAK = re.compile(r'(^\s+|\s*\n\s*\n\s*|\s+$)')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?…。！？])(\s+)')
+_WORD_BREAK = re.compile(r'(\s+)')
+
+
+def target_code(language_code):
+    """Returns the code DeepL expects for a target language; English needs a variant."""
+    return 'EN-US' if language_code == 'EN' else language_code
+
+
+def _pack(pieces, max_chars):
+    """Merges neighbouring items of a text/separator/text/... list as long as they fit in `max_chars`."""
+    packed = [pieces[0]]
+    for separator, text in zip(pieces[1::2], pieces[2::2]):
+        if len(packed[-1]) + len(separator) + len(text) <= max_chars:
+            packed[-1] += separator + text
+        else:
+            packed += [separator, text]
+    return packed
+
+
+def _split_long(segment, max_chars):
+    """Splits a segment longer than `max_chars` at sentence ends, then at spaces, then anywhere."""
+    pieces = []
+    for index, piece in enumerate(_pack(_SENTENCE_BREAK.split(segment), max_chars)):
+        if index % 2 or len(piece) <= max_chars:
+            pieces.append(piece)
+            continue
+        for word_index, part in enumerate(_pack(_WORD_BREAK.split(piece), max_chars)):
+            if word_index % 2 or len(part) <= max_chars:
+                pieces.append(part)
+                continue
+            for start in range(0, len(part), max_chars):
+                if start:
+                    pieces.append('')
+                pieces.append(part[start:start + max_chars])
+    return pieces
+
+
+def split_segments(text, max_chars=MAX_SEGMENT_CHARS):
+    """
+    Splits a text into the segments to translate and the whitespace between them. Returns a list
+    whose even items are segments (paragraphs, or runs of whole sentences for paragraphs longer than
+    `max_chars`) and odd items separators, so that ''.join(pieces) == text.
+    """
+    pieces = []
+    for index, piece in enumerate(_PARAGRAPH_BREAK.split(text)):
+        if index % 2 == 0 and len(piece) > max_chars:
+            pieces.extend(_split_long(piece, max_chars))
+        else:
+            pieces.append(piece)
+    return pieces
+
+
+def _batches(texts, max_texts, max_bytes):
+    """Groups texts into batches of at most `max_texts` texts and `max_bytes` UTF-8 bytes."""
+    batch, size = [], 0
+    for text in texts:
+        length = len(text.encode('utf-8'))
+        if batch and (len(batch) == max_texts or size + length > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(text)
+        size += length
+    if batch:
+        yield batch
+
+
+def normalize_segment(segment):
+    """Returns the form of a segment the translation memory is keyed by: NFC, with runs of whitespace collapsed."""
+    return ' '.join(unicodedata.normalize('NFC', segment).split())
+
+
+def _segment_hash(segment):
+    """Returns the 128-bit hash of a normalized segment."""
+    return hashlib.blake2b(normalize_segment(segment).encode('utf-8'), digest_size=16).digest()
+
+
+class TranslationMemory:
+    """
+    Translations of segments already paid for, kept in SQLite so unchanged text is never sent twice.
+
+    Entries are keyed by source language, target language and the hash of the normalized segment,
+    so whitespace changes do not count as edits. Every hit marks its entry as used; once the stored
+    translations exceed `max_bytes`, the least recently used entries are removed until they take
+    90% of it. Lookups, hits and characters saved are counted for this session and in the database.
+    """
+
+    _COUNTERS = ('lookups', 'hits', 'characters_saved')
+
+    def __init__(self, path=TRANSLATION_MEMORY_PATH, max_bytes=64 * 1024 * 1024):
+        """Opens (or creates) the memory database."""
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (source, target, hash)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS segments_by_use ON segments (last_used);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._size, self._clock = self._connection.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM segments").fetchone()
+        self.session = dict.fromkeys(self._COUNTERS, 0)
+
+    def lookup(self, segments, source_lang, target_lang):
+        """Returns {segment: translation} for the segments that are in the memory."""
+        hashes = {}
+        for segment in segments:
+            hashes.setdefault(_segment_hash(segment), []).append(segment)
+        found = {}
+        with self._lock:
+            keys = list(hashes)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT hash, translation FROM segments WHERE source = ? AND target = ? AND hash IN ({','.join('?' * len(chunk))})",
+                    (source_lang, target_lang, *chunk))
+                for key, translation in rows:
+                    for segment in hashes[key]:
+                        found[segment] = translation
+            self._connection.executemany("UPDATE segments SET last_used = ? WHERE source = ? AND target = ? AND hash = ?",
+                                         ((self._tick(), source_lang, target_lang, _segment_hash(segment)) for segment in found))
+            self._count(lookups=len(segments), hits=len(found), characters_saved=sum(len(segment) for segment in found))
+            self._connection.commit()
+        return found
+
+    def store(self, translations, source_lang, target_lang):
+        """Adds (segment, translation) pairs to the memory and evicts old entries if it grew too large."""
+        with self._lock:
+            for segment, translation in translations:
+                key = _segment_hash(segment)
+                size = len(translation.encode('utf-8')) + 64
+                row = self._connection.execute("SELECT size FROM segments WHERE source = ? AND target = ? AND hash = ?", (source_lang, target_lang, key)).fetchone()
+                self._connection.execute("INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?)", (source_lang, target_lang, key, translation, size, self._tick()))
+                self._size += size - (row[0] if row else 0)
+            if self._size > self._max_bytes:
+                self._evict(self._size - self._max_bytes * 9 // 10)
+            self._connection.commit()
+
+    def _tick(self):
+        """Returns the next use time; every entry touched gets its own, so eviction is per entry."""
+        self._clock += 1
+        return self._clock
+
+    def _evict(self, excess):
+        """Removes the fewest least recently used entries that together take at least `excess` bytes."""
+        self._connection.execute(
+            "DELETE FROM segments WHERE (source, target, hash) IN ("
+            "SELECT source, target, hash FROM (SELECT source, target, hash, SUM(size) OVER (ORDER BY last_used ROWS UNBOUNDED PRECEDING) - size AS before "
+            "FROM segments) WHERE before < ?)", (excess,))
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+
+    def _count(self, **amounts):
+        """Adds to the session counters and to the totals in the database."""
+        for name, amount in amounts.items():
+            self.session[name] += amount
+        self._connection.executemany("INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", amounts.items())
+
+    def report(self):
+        """Returns the counters of this session and of all sessions, with hit rates, and the size of the memory."""
+        with self._lock:
+            totals = dict.fromkeys(self._COUNTERS, 0)
+            totals.update(self._connection.execute("SELECT name, value FROM counters"))
+            entries = self._connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        report = {'entries': entries, 'bytes': self._size}
+        for scope, counters in (('session', self.session), ('total', totals)):
+            report[scope] = dict(counters, hit_rate=counters['hits'] / counters['lookups'] if counters['lookups'] else 0.0)
+        return report
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+
+def format_memory_report(report):
+    """Formats a `TranslationMemory.report` as lines of text."""
+    lines = [f"Translation memory: {report['entries']} segments, {report['bytes'] / 1024:.0f} KiB"]
+    for scope, title in (('session', 'This session'), ('total', 'All sessions')):
+        counters = report[scope]
+        lines.append(f"{title}: {counters['hits']} of {counters['lookups']} segments found ({counters['hit_rate']:.0%}), {counters['characters_saved']} characters not sent")
+    return '\n'.join(lines)
+
+
+class TranslationPipeline:
+    """
+    Translates texts through a DeepL-like translator in batched, concurrent requests.
+
+    Identical segments are sent once and blank ones not at all; with a `memory`, segments it knows
+    are not sent either and new translations are added to it. The batches of one call run on up
+    to `workers` threads and their results are put back in the order of the input. The counters
+    tell how many segments were translated, how many requests that took and how many characters
+    were sent (which is what DeepL bills).
+    """
+
+    def __init__(self, translator, workers=4, max_texts=MAX_REQUEST_TEXTS, max_bytes=MAX_REQUEST_BYTES, max_segment_chars=MAX_SEGMENT_CHARS, memory=None):
+        """Starts the thread pool the requests run on."""
+        self._translator = translator
+        self.memory = memory
+        self._max_texts = max_texts
+        self._max_bytes = max_bytes
+        self.max_segment_chars = max_segment_chars
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='translation')
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.unique_segments = 0
+        self.requests = 0
+        self.characters_sent = 0
+
+    def translate(self, text, source_lang, target_lang):
+        """Translates a text, keeping its paragraphs and the whitespace between them as they are."""
+        pieces = split_segments(text, self.max_segment_chars)
+        pieces[0::2] = self.translate_segments(pieces[0::2], source_lang, target_lang)
+        return ''.join(pieces)
+
+    def translate_segments(self, segments, source_lang, target_lang):
+        """Returns the translations of `segments` in their order."""
+        target_lang = target_code(target_lang)
+        unique = list(dict.fromkeys(segment for segment in segments if segment.strip()))
+        translations = self.memory.lookup(unique, source_lang, target_lang) if self.memory is not None else {}
+        missing = [segment for segment in unique if segment not in translations]
+        if missing:
+            new = list(zip(missing, self._request(missing, source_lang, target_lang)))
+            if self.memory is not None:
+                self.memory.store(new, source_lang, target_lang)
+            translations.update(new)
+        with self._lock:
+            self.segments += len(segments)
+            self.unique_segments += len(unique)
+        return [translations.get(segment, segment) for segment in segments]
+
+    def _request(self, texts, source_lang, target_lang):
+        """Sends the texts in batches on the thread pool and returns their translations in order."""
+        batches = list(_batches(texts, self._max_texts, self._max_bytes))
+        if len(batches) == 1:
+            return self._translate_batch(batches[0], source_lang, target_lang)
+        results = self._executor.map(self._translate_batch, batches, [source_lang] * len(batches), [target_lang] * len(batches))
+        return [translation for batch in results for translation in batch]
+
+    def _translate_batch(self, batch, source_lang, target_lang):
+        """Translates one batch of texts with a single request."""
+        results = self._translator.translate_text(batch, source_lang=source_lang, target_lang=target_lang)
+        with self._lock:
+            self.requests += 1
+            self.characters_sent += sum(len(text) for text in batch)
+        return [result.text for result in results]
+
+    def stats(self):
+        """Returns the counters as a dictionary."""
+        with self._lock:
+            return {'segments': self.segments, 'unique_segments': self.unique_segments, 'requests': self.requests, 'characters_sent': self.characters_sent}
+
+    def close(self):
+        """Stops the thread pool."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _diff(old, new):
+    """
+    Returns difflib opcodes that turn the list `old` into `new`. The common prefix and suffix are
+    matched first, so the usual single edit of a long text costs linear time.
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    opcodes = [('equal', 0, prefix, 0, prefix)] if prefix else []
+    matcher = SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix], autojunk=False)
+    opcodes += [(tag, prefix + i1, prefix + i2, prefix + j1, prefix + j2) for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
+    if suffix:
+        opcodes.append(('equal', len(old) - suffix, len(old), len(new) - suffix, len(new)))
+    return opcodes
+
+
+class IncrementalTranslator:
+    """
+    Re-translates a text that is being edited, sending only the paragraphs that changed.
+
+    The segments of the last text and their translations are kept. A new version is split the same
+    way and matched against them; segments that are unchanged reuse their translation, so only
+    edited or inserted ones go through the pipeline. Changing the languages starts over.
+    """
+
+    def __init__(self, pipeline):
+        """Starts without a previous text."""
+        self._pipeline = pipeline
+        self._languages = None
+        self._segments = []
+        self._units = []
+        self.reused = 0
+        self.retranslated = 0
+
+    def translate(self, text, source_lang, target_lang):
+        """
+        Returns the translation of the text and the edits that turn the previous translation into it:
+        (start, end, replacement) character ranges of the previous translation, in ascending order.
+        """
+        pieces = split_segments(text, self._pipeline.max_segment_chars)
+        segments = pieces[0::2]
+        if (source_lang, target_lang) != self._languages:
+            self._languages, self._segments, self._units = (source_lang, target_lang), [], []
+
+        translations = [None] * len(segments)
+        changed = []
+        for tag, old_start, old_end, start, end in _diff(self._segments, segments):
+            if tag == 'equal':
+                translations[start:end] = [translation for translation, _ in self._units[old_start:old_end]]
+            else:
+                changed.extend(range(start, end))
+        for index, translation in zip(changed, self._pipeline.translate_segments([segments[index] for index in changed], source_lang, target_lang)):
+            translations[index] = translation
+        self.reused += len(segments) - len(changed)
+        self.retranslated += len(changed)
+
+        # Every unit is a translated segment with the separator that follows it in the new text.
+        units = list(zip(translations, pieces[1::2] + ['']))
+        offsets = list(accumulate((len(translation) + len(separator) for translation, separator in self._units), initial=0))
+        edits = [(offsets[old_start], offsets[old_end], ''.join(translation + separator for translation, separator in units[start:end]))
+                 for tag, old_start, old_end, start, end in _diff(self._units, units) if tag != 'equal']
+        self._segments, self._units = segments, units
+        return ''.join(translation + separator for translation, separator in units), edits
+
+
+class TranslationCancelled(Exception):
+    """Raised when a file translation is cancelled before it has finished."""
+
+
+def _utf8_length(lead):
+    """Returns the number of bytes of the UTF-8 character that starts with the byte `lead`."""
+    return 1 if lead < 0xC0 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+
+
+def _read_chunks(source, chunk_bytes):
+    """
+    Yields (text, end offset) chunks of whole lines and about `chunk_bytes` from a binary UTF-8
+    file. A chunk is extended up to twice its size to end at a blank line, so paragraphs are not
+    split between chunks. Lines longer than a chunk are cut at a space, or else between characters.
+    """
+    # Room for the longest UTF-8 character, so a cut line always keeps at least one character.
+    line_bytes = max(chunk_bytes, 4)
+    while True:
+        lines, size = [], 0
+        while (size < chunk_bytes or (lines[-1].strip() and size < 2 * chunk_bytes)) and (line := source.readline(line_bytes)):
+            if len(line) == line_bytes and not line.endswith(b'\n'):
+                cut = line.rfind(b' ', line_bytes // 2) + 1
+                if not cut:
+                    # Keep the last character only if all of its bytes were read.
+                    cut = len(line) - 1
+                    while cut and line[cut] & 0xC0 == 0x80:
+                        cut -= 1
+                    if cut + _utf8_length(line[cut]) <= len(line):
+                        cut = len(line)
+                source.seek(cut - len(line), os.SEEK_CUR)
+                line = line[:cut]
+            lines.append(line)
+            size += len(line)
+        if not lines:
+            return
+        yield b''.join(lines).decode('utf-8'), source.tell()
+
+
+def _save_checkpoint(path, job, input_offset, output_offset):
+    """Records how far a file translation got, replacing the old checkpoint atomically."""
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump({'job': job, 'input_offset': input_offset, 'output_offset': output_offset}, f)
+    os.replace(temporary_path, path)
+
+
+def translate_file(pipeline, input_path, output_path, source_lang, target_lang, chunk_bytes=256 * 1024, in_flight=2, progress=None, cancel=None, restart=False):
+    """
+    Translates a UTF-8 text file into `output_path` without loading either into memory.
+
+    The input is read in chunks of about `chunk_bytes`; up to `in_flight` chunks are translated at a
+    time (each with the pipeline's own concurrent requests) and their translations are appended to
+    the output in order. After every chunk the output is flushed to disk and `output_path` +
+    ".checkpoint" records the offsets reached, so a job that was interrupted resumes from there
+    when it is started again with the same, unchanged input and languages (unless `restart`).
+    `progress(done, total)` is called with input bytes; setting the `cancel` event stops the job
+    with TranslationCancelled, keeping the checkpoint. Returns the number of bytes the job resumed at.
+    """
+    if chunk_bytes < MIN_CHUNK_BYTES:
+        raise ValueError(f'chunk_bytes must be at least {MIN_CHUNK_BYTES}.')
+    checkpoint_path = output_path + '.checkpoint'
+    stat = os.stat(input_path)
+    job = {'input': os.path.abspath(input_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'source': source_lang, 'target': target_lang}
+    input_offset = output_offset = 0
+    if not restart:
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['job'] == job and os.path.getsize(output_path) >= checkpoint['output_offset']:
+                input_offset, output_offset = checkpoint['input_offset'], checkpoint['output_offset']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(input_path, 'rb') as source, open(output_path, 'r+b' if output_offset else 'wb') as target, ThreadPoolExecutor(max_workers=in_flight) as executor:
+        source.seek(input_offset)
+        if input_offset == 0 and source.read(3) != b'\xef\xbb\xbf':
+            source.seek(0)
+        target.seek(output_offset)
+        target.truncate()
+        chunks = _read_chunks(source, chunk_bytes)
+        pending = deque()
+        while True:
+            while len(pending) < in_flight and (chunk := next(chunks, None)) is not None:
+                text, end = chunk
+                pending.append((executor.submit(pipeline.translate, text, source_lang, target_lang), end))
+            if not pending:
+                break
+            future, end = pending.popleft()
+            target.write(future.result().encode('utf-8'))
+            target.flush()
+            os.fsync(target.fileno())
+            _save_checkpoint(checkpoint_path, job, end, target.tell())
+            if progress is not None:
+                progress(end, stat.st_size)
+            if cancel is not None and cancel.is_set():
+                for future, _ in pending:
+                    future.cancel()
+                raise TranslationCancelled()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return input_offset
+
+
+FakeTextResult = namedtuple('FakeTextResult', 'text detected_source_lang')
+
+
+class FakeTranslator:
+    """
+    Local stand-in for `deepl.Translator` that needs neither a network nor an API key.
+
+    It "translates" a text by prefixing it with the target language, waits `latency` seconds per
+    request like a remote call would, rejects requests above DeepL's limits and counts the requests
+    and characters it received.
+    """
+
+    def __init__(self, latency=0.05, max_texts=50, max_bytes=128 * 1024):
+        """Sets the simulated latency and the request limits."""
+        self._latency = latency
+        self._max_texts = max_texts
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.characters = 0
+
+    def translate_text(self, text, source_lang=None, target_lang=None, **options):
+        """Returns one result for a string and a list of results for a list of strings, like DeepL."""
+        texts = [text] if isinstance(text, str) else list(text)
+        if len(texts) > self._max_texts or sum(len(item.encode('utf-8')) for item in texts) > self._max_bytes:
+            raise ValueError(f"Request too large: {len(texts)} texts; DeepL accepts {self._max_texts} texts and {self._max_bytes} bytes.")
+        if target_lang is None:
+            raise ValueError('target_lang is required.')
+        time.sleep(self._latency)
+        with self._lock:
+            self.requests += 1
+            self.characters += sum(len(item) for item in texts)
+        results = [FakeTextResult(f'[{target_lang}] {item}', source_lang or 'EN') for item in texts]
+        return results[0] if isinstance(text, str) else results
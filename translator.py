@@ -5,18 +5,45 @@ This program translates text using the DeepL API, https://www.deepl.com/pl/pro-a
 
 Usage:
   python translator.py <api_key>
+  python translator.py <api_key> translate [input] [-o output] [-s EN] [-t PL] [-w workers] [--memory PATH | --no-memory]
+  python translator.py <api_key> translate-file <input> <output> [-c chunk_bytes] [--restart] [same options as translate]
+  python translator.py <api_key> bench-incremental <input> [-e edits] [-r rounds]
+  python translator.py <api_key> memory [--memory PATH]
 
 Options:
-  <api_key>  (required) DeepL API key for authentication.
+  <api_key>  (required) DeepL API key for authentication, or "fake" for a local stand-in
+             translator that needs no network (for testing).
+
+Segments translated before are taken from a translation memory in ~/.translator_memory.sqlite3
+instead of being sent to DeepL again; the "memory" command reports how much that saved.
+"translate-file" streams files of any size and, when interrupted, resumes where it stopped.
 
 Example:
   python translator.py your_deepl_api_key
+  python translator.py fake translate notes.txt -t DE
 """
 
-import deepl
+import os
+import sys
+import time
+import queue
+import random
 import argparse
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
+from translation_core import MIN_CHUNK_BYTES, TRANSLATION_MEMORY_PATH, FakeTranslator, IncrementalTranslator, TranslationMemory, TranslationPipeline, format_memory_report, translate_file
+
+FAKE_API_KEY = "fake"
+
+
+def create_translator(api_key):
+    """Returns a DeepL translator for the key, or a FakeTranslator for the key "fake"."""
+    if api_key == FAKE_API_KEY:
+        return FakeTranslator()
+    import deepl
+    return deepl.Translator(api_key)
+
 
 class TranslatorApp(tk.Frame):
     """Main application class for translating text using DeepL."""
@@ -28,8 +55,13 @@ class TranslatorApp(tk.Frame):
         self._language_dict = {"English": "EN", "Dutch": "NL", "French": "FR", "German": "DE", "Italian": "IT", "Japanese": "JA", "Polish": "PL", "Russian": "RU", "Spanish": "ES", "Chinese": "ZH"}
         self._previous_source_lang = "English"
         self._previous_target_lang = "Polish"
+        self._results = queue.Queue()
+        self._file_events = queue.Queue()
+        self._busy = False
         self._create_widgets()
-        self._translator = deepl.Translator(api_key)
+        self._pipeline = TranslationPipeline(create_translator(api_key), memory=TranslationMemory())
+        self._incremental = IncrementalTranslator(self._pipeline)
+        self._shown_translation = None
 
     def _create_widgets(self):
         """Creates all the GUI widgets."""
@@ -40,11 +72,13 @@ class TranslatorApp(tk.Frame):
         self._main_menu.add_cascade(label="File", menu=self._file_menu)
         self._file_menu.add_command(label="Open File", command=self._open_file)
         self._file_menu.add_command(label="Save Translation", command=self._save_translation)
+        self._file_menu.add_command(label="Translate File...", command=self._translate_file)
         self._file_menu.add_command(label="Exit", command=self.master.destroy)
 
         self._about_menu = tk.Menu(self._main_menu, tearoff=0)
         self._main_menu.add_cascade(label="Help", menu=self._about_menu)
         self._about_menu.add_command(label="Help", command=self._show_help)
+        self._about_menu.add_command(label="Translation Memory", command=self._show_memory_report)
 
         lang_frame = tk.Frame(self)
         lang_frame.grid(row=0, column=0, columnspan=2, pady=10, padx=10)
@@ -112,25 +146,111 @@ class TranslatorApp(tk.Frame):
         self._text_output.insert(tk.END, input_text)
 
     def _translate_text(self):
-        """Translates the input text using DeepL."""
+        """Starts translating the input text using DeepL off the Tk thread."""
+        if self._busy:
+            return  # The incremental translator keeps state between calls, so it never runs next to another job.
         text = self._text_input.get("1.0", tk.END).strip()
         source_lang_code = self._language_dict.get(self._source_lang_var.get())
         target_lang_code = self._language_dict.get(self._target_lang_var.get())
-        
-        if target_lang_code == "EN":
-            target_lang_code = "EN-US"
 
         if not text:
             messagebox.showwarning("Error", "The text input field cannot be empty.")
             return
 
+        self._set_busy("Translating...")
+        threading.Thread(target=self._translate_in_background, args=(text, source_lang_code, target_lang_code), daemon=True).start()
+        self.after(50, self._poll_translation)
+
+    def _translate_in_background(self, text, source_lang_code, target_lang_code):
+        """Runs the translation pipeline and hands the outcome to the Tk thread through the result queue."""
         try:
-            result = self._translator.translate_text(text, source_lang=source_lang_code, target_lang=target_lang_code) # type: ignore
-            translated_text = result.text  # type: ignore
+            self._results.put((self._incremental.translate(text, source_lang_code, target_lang_code), None))
+        except Exception as e:
+            self._results.put((None, e))
+
+    def _poll_translation(self):
+        """Shows the translation once the background thread has finished."""
+        try:
+            result, error = self._results.get_nowait()
+        except queue.Empty:
+            self.after(50, self._poll_translation)
+            return
+
+        self._set_idle()
+        if error is not None:
+            messagebox.showerror("Translation Error", str(error))
+            return
+        translated_text, edits = result
+        shown_text = self._text_output.get("1.0", "end-1c")
+        # Tk counts characters outside the BMP as two, so the edit offsets only apply to texts without them.
+        if shown_text == self._shown_translation and max(shown_text + translated_text, default="") <= "\uffff":
+            for start, end, replacement in reversed(edits):
+                self._text_output.delete(f"1.0 + {start} chars", f"1.0 + {end} chars")
+                self._text_output.insert(f"1.0 + {start} chars", replacement)
+        else:
             self._text_output.delete("1.0", tk.END)
             self._text_output.insert(tk.END, translated_text)
+        self._shown_translation = translated_text
+
+    def _set_busy(self, text):
+        """Marks a translation as running and disables everything that would start another one."""
+        self._busy = True
+        self._translate_button.config(state=tk.DISABLED, text=text)
+        self._file_menu.entryconfig("Translate File...", state=tk.DISABLED)
+
+    def _set_idle(self):
+        """Enables starting translations again once the running one has finished."""
+        self._busy = False
+        self._translate_button.config(state=tk.NORMAL, text="Translate")
+        self._file_menu.entryconfig("Translate File...", state=tk.NORMAL)
+
+    def _translate_file(self):
+        """Translates a *.txt file straight into another file off the Tk thread, for files too large for the text fields."""
+        if self._busy:
+            return
+        input_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
+        if not input_path:
+            return
+        output_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")])
+        if not output_path:
+            return
+
+        source_lang_code = self._language_dict.get(self._source_lang_var.get())
+        target_lang_code = self._language_dict.get(self._target_lang_var.get())
+        self._set_busy("Translating file...")
+        threading.Thread(target=self._translate_file_in_background, args=(input_path, output_path, source_lang_code, target_lang_code), daemon=True).start()
+        self.after(100, self._poll_file_translation)
+
+    def _translate_file_in_background(self, input_path, output_path, source_lang_code, target_lang_code):
+        """Runs the file translation and reports progress through the file event queue."""
+        try:
+            translate_file(self._pipeline, input_path, output_path, source_lang_code, target_lang_code, progress=lambda done, total: self._file_events.put(("progress", done, total)))
+            self._file_events.put(("done", output_path, None))
         except Exception as e:
-            messagebox.showerror("Translation Error", str(e))
+            self._file_events.put(("error", e, None))
+
+    def _poll_file_translation(self):
+        """Shows the progress of the background file translation and reports its outcome."""
+        while True:
+            try:
+                event, first, second = self._file_events.get_nowait()
+            except queue.Empty:
+                self.after(100, self._poll_file_translation)
+                return
+            if event == "progress":
+                self._translate_button.config(text=f"Translating file... {first / max(second, 1):.0%}")
+                continue
+
+            self._set_idle()
+            if event == "done":
+                messagebox.showinfo("Success", f"Translated file saved to:\n{first}")
+            else:
+                messagebox.showerror("Translation Error", f"{first}\n\nTranslating the same file again resumes where it stopped.")
+            return
+
+    def _show_memory_report(self):
+        """Displays how often the translation memory was used and how many characters it saved."""
+        messagebox.showinfo("Translation Memory", format_memory_report(self._pipeline.memory.report()))
 
     def _save_translation(self):
         """Saves the translated text to a .txt file."""
@@ -149,11 +269,174 @@ class TranslatorApp(tk.Frame):
         """Displays a help message."""
         messagebox.showinfo("Help", "Enter text, select languages, and click 'Translate' to get the translation.")
 
+def _make_pipeline(args):
+    """Returns the translation pipeline the options ask for, with the translation memory unless it is disabled."""
+    memory = None if args.no_memory else TranslationMemory(args.memory)
+    return TranslationPipeline(create_translator(args.api_key), workers=args.workers, memory=memory)
+
+
+def _print_report(pipeline, elapsed):
+    """Prints what a command-line translation took to standard error and closes its pipeline."""
+    pipeline.close()
+    stats = pipeline.stats()
+    print(f"Translated {stats['segments']} segments ({stats['unique_segments']} unique) in {stats['requests']} requests, "
+          f"{stats['characters_sent']} characters sent, in {elapsed:.2f} s", file=sys.stderr)
+    if pipeline.memory is not None:
+        print(format_memory_report(pipeline.memory.report()), file=sys.stderr)
+        pipeline.memory.close()
+
+
+def _run_translate(args, parser):
+    """Translates a text file (or standard input) from the command line and reports what it took."""
+    try:
+        if args.input == "-":
+            text = sys.stdin.read()
+        else:
+            with open(args.input, "r", encoding="utf-8") as file:
+                text = file.read()
+    except OSError as e:
+        parser.error(str(e))
+
+    pipeline = _make_pipeline(args)
+    start = time.perf_counter()
+    try:
+        translated_text = pipeline.translate(text, args.source, args.target)
+    except Exception as e:
+        pipeline.close()
+        sys.exit(f"Translation failed: {e}")
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(translated_text)
+    else:
+        sys.stdout.write(translated_text)
+    _print_report(pipeline, elapsed)
+
+
+def _run_translate_file(args, parser):
+    """Streams a large text file through the translator, resuming an interrupted job, and reports what it took."""
+    if not os.path.isfile(args.input):
+        parser.error(f"No such file: {args.input}")
+    if args.chunk_size < MIN_CHUNK_BYTES:
+        parser.error(f"--chunk-size must be at least {MIN_CHUNK_BYTES} bytes")
+
+    def show_progress(done, total):
+        print(f"\r{done / max(total, 1):.1%} of {total / 1024 / 1024:.1f} MiB", end="", file=sys.stderr, flush=True)
+
+    pipeline = _make_pipeline(args)
+    start = time.perf_counter()
+    try:
+        resumed_at = translate_file(pipeline, args.input, args.output, args.source, args.target, args.chunk_size, progress=show_progress, restart=args.restart)
+    except KeyboardInterrupt:
+        pipeline.close()
+        sys.exit("\nInterrupted; run the same command again to resume.")
+    except Exception as e:
+        pipeline.close()
+        sys.exit(f"\nTranslation failed: {e}; run the same command again to resume.")
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    if resumed_at:
+        print(f"Resumed at byte {resumed_at}", file=sys.stderr)
+    _print_report(pipeline, elapsed)
+
+
+def _run_incremental_benchmark(args, parser):
+    """Edits random paragraphs of a text file and times re-translating only them against translating everything again."""
+    try:
+        with open(args.input, "r", encoding="utf-8") as file:
+            paragraphs = file.read().split("\n\n")
+    except OSError as e:
+        parser.error(str(e))
+
+    translator = create_translator(args.api_key)
+    full = TranslationPipeline(translator, workers=args.workers)
+    partial = TranslationPipeline(translator, workers=args.workers)
+    incremental = IncrementalTranslator(partial)
+    incremental.translate("\n\n".join(paragraphs), args.source, args.target)
+    full_time = incremental_time = full_chars = incremental_chars = 0
+    for round_number in range(args.rounds):
+        for index in random.sample(range(len(paragraphs)), min(args.edits, len(paragraphs))):
+            paragraphs[index] = f"{paragraphs[index]} (edit {round_number})"
+        text = "\n\n".join(paragraphs)
+
+        chars = full.characters_sent
+        start = time.perf_counter()
+        expected = full.translate(text, args.source, args.target)
+        full_time += time.perf_counter() - start
+        full_chars += full.characters_sent - chars
+
+        chars = partial.characters_sent
+        start = time.perf_counter()
+        translated_text, _ = incremental.translate(text, args.source, args.target)
+        incremental_time += time.perf_counter() - start
+        incremental_chars += partial.characters_sent - chars
+        assert translated_text == expected
+    full.close()
+    partial.close()
+    print(f"{'full re-translation':>22}: {full_time / args.rounds * 1000:8.1f} ms, {full_chars // args.rounds:9} characters sent per round")
+    print(f"{'edited paragraphs only':>22}: {incremental_time / args.rounds * 1000:8.1f} ms, {incremental_chars // args.rounds:9} characters sent per round")
+
+
+def _run_memory_report(args):
+    """Prints how often the translation memory was used and how many characters it saved."""
+    memory = TranslationMemory(args.memory)
+    try:
+        print(format_memory_report(memory.report()))
+    finally:
+        memory.close()
+
+
 def main():
-    parser = argparse.ArgumentParser(description='Translate text using DeepL.')
-    parser.add_argument('api_key', help='DeepL API key for authentication.')
+    parser = argparse.ArgumentParser(description='Translate text using DeepL. Without a command the GUI is started.')
+    parser.add_argument('api_key', help='DeepL API key for authentication, or "fake" for a local stand-in translator.')
+    commands = parser.add_subparsers(dest='command')
+
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('-s', '--source', type=str.upper, default='EN', help='Source language code, e.g. EN.')
+    options.add_argument('-t', '--target', type=str.upper, default='PL', help='Target language code, e.g. PL.')
+    options.add_argument('-w', '--workers', type=int, default=4, help='Number of requests sent at the same time.')
+    options.add_argument('--memory', default=TRANSLATION_MEMORY_PATH, help='Translation memory database.')
+    options.add_argument('--no-memory', action='store_true', help='Send every segment to DeepL, without using the translation memory.')
+
+    translate = commands.add_parser('translate', parents=[options], help='Translate a text file without the GUI.')
+    translate.add_argument('input', nargs='?', default='-', help='UTF-8 text file to translate (standard input by default).')
+    translate.add_argument('-o', '--output', help='File to write the translation to (standard output by default).')
+
+    translate_large = commands.add_parser('translate-file', parents=[options], help='Translate a large text file chunk by chunk, resuming an interrupted job.')
+    translate_large.add_argument('input', help='UTF-8 text file to translate.')
+    translate_large.add_argument('output', help='File to write the translation to.')
+    translate_large.add_argument('-c', '--chunk-size', type=int, default=256 * 1024, help='Bytes of input translated at a time.')
+    translate_large.add_argument('--restart', action='store_true', help='Start from the beginning even if an earlier job was interrupted.')
+
+    bench = commands.add_parser('bench-incremental', help='Time re-translating only edited paragraphs against translating everything again.')
+    bench.add_argument('input', help='UTF-8 text file to edit and translate.')
+    bench.add_argument('-s', '--source', type=str.upper, default='EN', help='Source language code, e.g. EN.')
+    bench.add_argument('-t', '--target', type=str.upper, default='PL', help='Target language code, e.g. PL.')
+    bench.add_argument('-w', '--workers', type=int, default=4, help='Number of requests sent at the same time.')
+    bench.add_argument('-e', '--edits', type=int, default=1, help='Paragraphs edited per round.')
+    bench.add_argument('-r', '--rounds', type=int, default=10, help='Number of rounds.')
+
+    report = commands.add_parser('memory', help='Report the hit rate of the translation memory and the characters it saved.')
+    report.add_argument('--memory', default=TRANSLATION_MEMORY_PATH, help='Translation memory database.')
     args = parser.parse_args()
 
+    if args.command == 'translate':
+        _run_translate(args, translate)
+        return
+
+    if args.command == 'translate-file':
+        _run_translate_file(args, translate_large)
+        return
+
+    if args.command == 'bench-incremental':
+        _run_incremental_benchmark(args, bench)
+        return
+
+    if args.command == 'memory':
+        _run_memory_report(args)
+        return
+
     root = tk.Tk()
     root.title("Text Translator")
     root.geometry("800x360")
@@ -163,4 +446,4 @@ def main():
     root.mainloop()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()